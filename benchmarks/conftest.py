@@ -0,0 +1,40 @@
+import os
+from unittest.mock import patch
+
+import pytest
+from github.Repository import Repository
+
+from maintainer import GithubProvider, RegistryStack
+from tests.generator import SyntheticRegistry, generate_registry
+from tests.mocker import MOCKED_HEADERS, MOCKED_REQUESTER
+
+# the largest registry generated can be lowered for quick local runs,
+# e.g. BENCH_MAX_STACKS=1000 make bench
+BENCH_MAX_STACKS = int(os.getenv("BENCH_MAX_STACKS", 10000))
+BENCH_SIZES = [s for s in (100, 1000, 10000) if s <= BENCH_MAX_STACKS]
+
+
+@pytest.fixture(
+    scope="session", params=BENCH_SIZES, ids=lambda s: "{}-stacks".format(s)
+)
+def synthetic_registry(request: pytest.FixtureRequest) -> SyntheticRegistry:
+    return generate_registry(request.param)
+
+
+@pytest.fixture(scope="session")
+def synthetic_provider(synthetic_registry: SyntheticRegistry):
+    repo = Repository(
+        requester=MOCKED_REQUESTER,
+        headers=MOCKED_HEADERS,
+        attributes={"full_name": "synthetic/registry"},
+        completed=True,
+    )
+    with patch("github.MainClass.Github.get_repo", return_value=repo), patch.object(
+        repo, "get_contents", synthetic_registry.get_contents
+    ), patch.object(repo, "get_commits", synthetic_registry.get_commits):
+        yield GithubProvider(token="bench-token")
+
+
+@pytest.fixture(scope="session")
+def synthetic_stacks(synthetic_provider: GithubProvider) -> list[RegistryStack]:
+    return synthetic_provider.get_stacks()
@@ -0,0 +1,56 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from benchmarks.conftest import BENCH_SIZES
+from maintainer import STACKS_DIR, GithubProvider
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+
+# the rest path makes a request per dir, file and history, so it is only
+# measured on the smaller registries
+REST_MAX_STACKS = 1000
+
+
+@pytest.fixture(scope="module", params=BENCH_SIZES, ids=lambda s: "{}-stacks".format(s))
+def mirrored_server(request: pytest.FixtureRequest, tmp_path_factory):
+    registry = generate_registry(request.param)
+    mirror = registry.to_git_repo(str(tmp_path_factory.mktemp("mirror") / "r.git"))
+    # several rounds of the rest path go beyond the default rate limit
+    with FakeGithubServer(registry, rate_limit=10**6) as server:
+        yield server, mirror, request.param
+
+
+def _read_rest(provider: GithubProvider) -> int:
+    devfiles, owner_files = provider._get_repo_items(STACKS_DIR)
+    for item in devfiles + owner_files:
+        item.decoded_content
+    for item in devfiles:
+        provider._get_last_modified(item)
+    return len(devfiles) + len(owner_files)
+
+
+def _read_git(provider: GithubProvider) -> int:
+    devfiles, owner_files = provider._get_git_items(STACKS_DIR)
+    return len(devfiles) + len(owner_files)
+
+
+@pytest.mark.parametrize("source", ["api", "git"])
+def test_read_registry_files(
+    benchmark: BenchmarkFixture, mirrored_server: tuple, source: str
+) -> None:
+    server, mirror, size = mirrored_server
+    if source == "api" and size > REST_MAX_STACKS:
+        pytest.skip("rest path is too slow above {} stacks".format(REST_MAX_STACKS))
+    provider = GithubProvider(
+        token="bench-token",
+        registry_url=server.state.repo,
+        base_url=server.base_url,
+        stacks_source=source,
+        local_mirror=mirror,
+    )
+    read = _read_git if source == "git" else _read_rest
+
+    server.reset_stats()
+    files = benchmark.pedantic(read, args=(provider,), rounds=3)
+    benchmark.extra_info["files"] = files
+    benchmark.extra_info["requests"] = len(server.requests)
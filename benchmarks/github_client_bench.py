@@ -0,0 +1,61 @@
+import pytest
+from github import Auth, Github
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from maintainer import GithubProvider, build_github_client
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+
+
+class LegacyGithubProvider(GithubProvider):
+    """
+    sets up github like the provider did before the client factory: a client
+    validating the credentials and a second one used for the run.
+    """
+
+    def _init_github(self, token: str) -> Github:
+        kwargs = dict(
+            auth=Auth.Token(token),
+            base_url=self.base_url,
+            seconds_between_requests=None,
+            seconds_between_writes=None,
+        )
+        Github(**kwargs).get_user().login  # type: ignore
+        return Github(**kwargs)  # type: ignore
+
+
+class TunedGithubProvider(GithubProvider):
+    def _init_github(self, token: str) -> Github:
+        return build_github_client(token, base_url=self.base_url, throttle=False)
+
+
+@pytest.fixture(scope="module")
+def long_history_server():
+    # long commit histories make the page size visible
+    with FakeGithubServer(generate_registry(100, max_commits=120)) as server:
+        yield server
+
+
+@pytest.mark.parametrize(
+    "provider_class",
+    [LegacyGithubProvider, TunedGithubProvider],
+    ids=["legacy", "tuned"],
+)
+def test_github_client_requests(
+    benchmark: BenchmarkFixture,
+    long_history_server: FakeGithubServer,
+    provider_class: type[GithubProvider],
+) -> None:
+    def run() -> tuple[int, int]:
+        long_history_server.reset_stats()
+        provider = provider_class(
+            token="bench-token",
+            registry_url=long_history_server.state.repo,
+            base_url=long_history_server.base_url,
+        )
+        provider.get_stacks()
+        return len(long_history_server.requests), long_history_server.connections
+
+    requests, connections = benchmark.pedantic(run, rounds=3)
+    benchmark.extra_info["requests"] = requests
+    benchmark.extra_info["connections"] = connections
@@ -0,0 +1,194 @@
+from datetime import datetime
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import maintainer as _maintainer
+from maintainer import (
+    DATETIME_STRFTIME_FORMAT,
+    DEPRECATED_TAG,
+    DEVFILE_SCHEMA_PATH,
+    GithubProvider,
+    RegistryStack,
+    RegistryStackMaintainer,
+    evaluate_policy,
+    parse_all_stack_facts,
+    parse_stack_facts,
+    to_epoch,
+)
+from tests.generator import SyntheticRegistry
+
+
+def _rounds(registry: SyntheticRegistry) -> int:
+    # keep the 10k runs bounded while still averaging the small ones
+    return max(1, 1000 // len(registry.devfile_paths))
+
+
+def test_get_stacks(
+    benchmark: BenchmarkFixture,
+    synthetic_registry: SyntheticRegistry,
+    synthetic_provider: GithubProvider,
+) -> None:
+    stacks = benchmark.pedantic(
+        synthetic_provider.get_stacks, rounds=_rounds(synthetic_registry)
+    )
+    assert len(stacks) == len(synthetic_registry.devfile_paths)
+
+
+def test_get_matched_devfile_owners(
+    benchmark: BenchmarkFixture,
+    synthetic_registry: SyntheticRegistry,
+    synthetic_provider: GithubProvider,
+) -> None:
+    devfiles, owner_files = synthetic_provider._get_repo_items(
+        synthetic_registry.stacks_dir
+    )
+    matchings = benchmark.pedantic(
+        synthetic_provider._get_matched_devfile_owners,
+        args=(devfiles, owner_files),
+        rounds=_rounds(synthetic_registry),
+    )
+    assert len(matchings) == len(devfiles)
+
+
+def test_registry_stack_parsing(
+    benchmark: BenchmarkFixture, synthetic_registry: SyntheticRegistry
+) -> None:
+    raw = [
+        (
+            path,
+            synthetic_registry.files[path],
+            synthetic_registry.last_modified(path).strftime(  # type: ignore
+                DATETIME_STRFTIME_FORMAT
+            ),
+        )
+        for path in synthetic_registry.devfile_paths
+    ]
+    owners = synthetic_registry.files["{}/OWNERS".format(synthetic_registry.stacks_dir)]
+
+    def parse() -> list[RegistryStack]:
+        return [
+            RegistryStack(
+                path=path,
+                raw_content=content,
+                last_modified=last_modified,
+                file_sha="sha",
+                owners_content=owners,
+            )
+            for path, content, last_modified in raw
+        ]
+
+    stacks = benchmark.pedantic(parse, rounds=_rounds(synthetic_registry))
+    assert len(stacks) == len(raw)
+
+
+@pytest.mark.parametrize(
+    "workers,chunk_size",
+    [(0, 0), (2, 1), (2, 0), (4, 0)],
+    ids=["serial", "2-workers-unchunked", "2-workers", "4-workers"],
+)
+def test_parse_stack_facts(
+    benchmark: BenchmarkFixture,
+    synthetic_registry: SyntheticRegistry,
+    workers: int,
+    chunk_size: int,
+) -> None:
+    owners = synthetic_registry.files[
+        "{}/OWNERS".format(synthetic_registry.stacks_dir)
+    ].encode()
+    items = [
+        (path, synthetic_registry.files[path].encode(), owners)
+        for path in synthetic_registry.devfile_paths
+    ]
+
+    facts = benchmark.pedantic(
+        parse_all_stack_facts,
+        args=(items, workers, chunk_size),
+        rounds=_rounds(synthetic_registry),
+    )
+    assert len(facts) == len(items)
+
+
+@pytest.mark.parametrize(
+    "validation", ["none", "cached-validator", "validator-per-stack"]
+)
+def test_validate_stack_facts(
+    benchmark: BenchmarkFixture, synthetic_registry: SyntheticRegistry, validation: str
+) -> None:
+    items = [
+        (path, synthetic_registry.files[path].encode(), None)
+        for path in synthetic_registry.devfile_paths
+    ]
+
+    def parse() -> list:
+        if validation == "none":
+            return parse_stack_facts(items)
+        if validation == "cached-validator":
+            return parse_stack_facts(items, DEVFILE_SCHEMA_PATH)
+        facts = []
+        for item in items:
+            _maintainer._schema_validators.clear()
+            facts.extend(parse_stack_facts([item], DEVFILE_SCHEMA_PATH))
+        return facts
+
+    facts = benchmark.pedantic(parse, rounds=_rounds(synthetic_registry))
+    assert all(len(f.schema_errors) == 0 for f in facts)
+
+
+def test_maintainer_update(
+    benchmark: BenchmarkFixture,
+    synthetic_registry: SyntheticRegistry,
+    synthetic_stacks: list[RegistryStack],
+) -> None:
+    maintainer = RegistryStackMaintainer()
+
+    def update() -> list:
+        return [maintainer.update(stack) for stack in synthetic_stacks]
+
+    prs = benchmark.pedantic(update, rounds=_rounds(synthetic_registry))
+    assert len(prs) == len(synthetic_stacks)
+
+
+def test_maintainer_update_all(
+    benchmark: BenchmarkFixture,
+    synthetic_registry: SyntheticRegistry,
+    synthetic_stacks: list[RegistryStack],
+) -> None:
+    maintainer = RegistryStackMaintainer()
+    prs = benchmark.pedantic(
+        maintainer.update_all,
+        args=(synthetic_stacks,),
+        rounds=_rounds(synthetic_registry),
+    )
+    # same PRs as the per stack update, only sorted by staleness
+    assert sorted(pr.branch_name for pr in prs) == sorted(
+        pr.branch_name for pr in map(maintainer.update, synthetic_stacks) if pr
+    )
+
+
+@pytest.mark.parametrize("method", ["patch", "dump"])
+def test_add_deprecated_tag(
+    benchmark: BenchmarkFixture, synthetic_registry: SyntheticRegistry, method: str
+) -> None:
+    maintainer = RegistryStackMaintainer()
+    add_tag = maintainer._patch_tag if method == "patch" else maintainer._dump_tag
+    # a PR is created for a fraction of the stacks only
+    contents = [
+        synthetic_registry.files[path] for path in synthetic_registry.devfile_paths
+    ][:100]
+
+    def deprecate() -> list:
+        return [add_tag(content, DEPRECATED_TAG) for content in contents]
+
+    updated = benchmark.pedantic(deprecate, rounds=10)
+    assert None not in updated
+
+
+def test_evaluate_policy(
+    benchmark: BenchmarkFixture, synthetic_stacks: list[RegistryStack]
+) -> None:
+    epochs = [to_epoch(s.last_modified) for s in synthetic_stacks]
+    deprecated = [s.deprecated for s in synthetic_stacks]
+    now = to_epoch(datetime.now())
+    plan = benchmark(evaluate_policy, epochs, deprecated, now)
+    assert len(plan.deprecate_mask) == len(synthetic_stacks)
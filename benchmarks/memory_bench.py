@@ -0,0 +1,58 @@
+import tracemalloc
+from typing import Any, Callable
+
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from maintainer import CompactRegistryStack, OwnersTable, RegistryStack
+
+
+def _allocated(build: Callable[[], list[Any]]) -> tuple[list[Any], int]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        items = build()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    return items, sum(s.size_diff for s in after.compare_to(before, "filename"))
+
+
+def test_compact_stacks_memory(
+    benchmark: BenchmarkFixture, synthetic_stacks: list[RegistryStack]
+) -> None:
+    """
+    compares the memory retained by RegistryStack objects against their
+    CompactRegistryStack counterparts.
+    """
+
+    def build_regular() -> list[RegistryStack]:
+        # a fresh copy, so the allocations are tracked
+        return [
+            RegistryStack(
+                path=s.devfile_path,
+                raw_content=s.devfile_content,
+                last_modified=s.last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT"),
+                file_sha=s.file_sha,
+                owners_content="reviewers:\n{}".format(
+                    "\n".join("  - {}".format(o) for o in s.owners)
+                ),
+            )
+            for s in synthetic_stacks[:1000]
+        ]
+
+    def build_compact() -> list[CompactRegistryStack]:
+        table = OwnersTable()
+        return [
+            CompactRegistryStack.from_registry_stack(s, table, str)
+            for s in synthetic_stacks
+        ]
+
+    regular, regular_bytes = _allocated(build_regular)
+    compact, compact_bytes = benchmark.pedantic(
+        _allocated, args=(build_compact,), rounds=1
+    )
+    regular_per_stack = regular_bytes / len(regular)
+    compact_per_stack = compact_bytes / len(compact)
+    benchmark.extra_info["regular_bytes_per_stack"] = regular_per_stack
+    benchmark.extra_info["compact_bytes_per_stack"] = compact_per_stack
+    assert compact_per_stack < regular_per_stack
@@ -4,12 +4,15 @@ from datetime import datetime, timedelta
 import pytest
 
 from maintainer import (
+    DATETIME_STRFTIME_FORMAT,
     DEPRECATION_DAYS_LIMIT,
     GithubProvider,
     RegistryStack,
     RegistryStackMaintainer,
     get_YAML,
 )
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
 
 
 @pytest.fixture(scope="session")
@@ -32,7 +35,9 @@ def test_registry_stack(owners_content: str):
     yield RegistryStack(
         path="stacks/test-stack/1.1.0/devfile.yaml",
         raw_content="metadata:\n title: test-stack\n tags:\n - tag",
-        last_modified="Sun, 03 Mar 2024 22:01:01 GMT",
+        last_modified=datetime.strftime(
+            (datetime.now() - timedelta(days=10)), DATETIME_STRFTIME_FORMAT
+        ),
         file_sha="somesha",
         owners_content=owners_content,
     )
@@ -75,9 +80,19 @@ def test_registry_stack_no_owners():
 
 
 @pytest.fixture(scope="session")
-def github_provider():
+def fake_github():
+    with FakeGithubServer(generate_registry(20)) as server:
+        yield server
+
+
+@pytest.fixture(scope="session")
+def github_provider(fake_github: FakeGithubServer):
     os.environ["TEST_MODE"] = "1"
-    yield GithubProvider(token="test-token")
+    yield GithubProvider(
+        token="test-token",
+        registry_url=fake_github.state.repo,
+        base_url=fake_github.base_url,
+    )
 
 
 @pytest.fixture(scope="session")
@@ -9,4 +9,5 @@ set -e
 # REGISTRY_REPO=$INPUT_REGISTRY_REPO \
 # REMOVAL_DAYS_LIMIT=$INPUT_REMOVAL_DAYS_LIMIT \
 # STACKS_DIR=$INPUT_STACKS_DIR \
-python /maintainer.py
\ No newline at end of file
+# run as a module, so the bytecode compiled at build time is used
+PYTHONPATH=/ python -P -m maintainer run
\ No newline at end of file
@@ -24,18 +24,43 @@
 # are met.
 # 4. For every update action it creates a RegistryRepoPR obj.
 # 5. For every RegistryRepoPR creates a PR to github.com.
+
+# Heavy dependencies (PyGithub, ruamel.yaml) are imported only by the
+# functions using them, so the CLI starts fast and `--help` or a no-op run
+# doesn't pay for them.
+from __future__ import annotations
+
+import argparse
+import bisect
+import calendar
+import gzip
 import io
+import json
 import logging
+import math
 import os
 import sys
-from dataclasses import dataclass
-from datetime import datetime, timedelta
-from typing import Any, Literal
-
-from github import Auth, Github
-from github.ContentFile import ContentFile
-from github.GithubException import BadCredentialsException, GithubException
-from ruamel.yaml import YAML
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Literal, Sequence
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from subprocess import Popen
+    from threading import Thread
+
+    from github import Github
+    from github.ContentFile import ContentFile
+    from github.Repository import Repository
+    from github.Requester import (
+        HTTPRequestsConnectionClass,
+        HTTPSRequestsConnectionClass,
+    )
+    from ruamel.yaml import YAML
 
 
 class CriticalException(Exception):
@@ -50,18 +75,72 @@ def get_int_env_var(env_var: str, default: int) -> int:
         sys.exit(1)
 
 
+# int inputs read on import with their defaults. They are validated by
+# check_inputs once a command runs, so an invalid value doesn't break `--help`.
+_int_inputs: dict[str, int] = {}
+
+
+def get_int_input(env_var: str, default: int) -> int:
+    _int_inputs[env_var] = default
+    try:
+        return int(os.getenv(env_var, default))
+    except ValueError:
+        return default
+
+
+def check_inputs() -> None:
+    """
+    exits on the first int input having an invalid value.
+    """
+    for env_var, default in _int_inputs.items():
+        get_int_env_var(env_var, default)
+
+
 GITHUB_TOKEN = os.getenv("INPUT_REGISTRY_REPO_TOKEN", "")
-DEBUG_MODE = get_int_env_var("INPUT_DEBUG_MODE", 0)
+CASSETTE_MODE = os.getenv("INPUT_CASSETTE_MODE", "")
+CASSETTE_PATH = os.getenv("INPUT_CASSETTE_PATH", "drm_cassette.jsonl.gz")
+COMPACT_STACKS = get_int_input("INPUT_COMPACT_STACKS", 0)
+DAEMON_HOST = os.getenv("INPUT_DAEMON_HOST", "127.0.0.1")
+DAEMON_INTERVAL = get_int_input("INPUT_DAEMON_INTERVAL", 300)
+DAEMON_PORT = get_int_input("INPUT_DAEMON_PORT", 8080)
+DAEMON_RESCAN_INTERVAL = get_int_input("INPUT_DAEMON_RESCAN_INTERVAL", 86400)
+DEBUG_MODE = get_int_input("INPUT_DEBUG_MODE", 0)
 DATETIME_STRFTIME_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
 DATETIME_STRPTIME_FORMAT = "%a, %d %b %Y %H:%M:%S %Z"
 DEFAULT_BRANCH = os.getenv("INPUT_DEFAULT_BRANCH", "main")
-DEPRECATION_DAYS_LIMIT = get_int_env_var("INPUT_DEPRECATION_INACTIVITY_LIMIT", 365)
+DEPRECATION_DAYS_LIMIT = get_int_input("INPUT_DEPRECATION_INACTIVITY_LIMIT", 365)
 DEPRECATED_TAG = "Deprecated"
-PR_CREATION_LIMIT = get_int_env_var("INPUT_PR_CREATION_LIMIT", 5)
+# a subset of the devfile schema is vendored next to the script
+DEVFILE_SCHEMA_PATH = os.getenv("INPUT_DEVFILE_SCHEMA_PATH") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "schemas", "devfile.json"
+)
+EXPIRY_INDEX_PATH = os.getenv("INPUT_EXPIRY_INDEX_PATH", "")
+GITHUB_API_URL = os.getenv("INPUT_GITHUB_API_URL", "https://api.github.com")
+GITHUB_PER_PAGE = 100
+GITHUB_POOL_SIZE = get_int_input("INPUT_GITHUB_POOL_SIZE", 10)
+GITHUB_RETRIES = get_int_input("INPUT_GITHUB_RETRIES", 3)
+GITHUB_TIMEOUT = get_int_input("INPUT_GITHUB_TIMEOUT", 15)
+JOURNAL_PATH = os.getenv("INPUT_JOURNAL_PATH", "")
+LOCAL_MIRROR = os.getenv("INPUT_LOCAL_MIRROR", "")
+PARSE_CHUNK_SIZE = get_int_input("INPUT_PARSE_CHUNK_SIZE", 0)
+PARSE_WORKERS = get_int_input("INPUT_PARSE_WORKERS", 0)
+PR_CREATION_LIMIT = get_int_input("INPUT_PR_CREATION_LIMIT", 5)
+REGISTRIES = os.getenv("INPUT_REGISTRIES", "")
 REGISTRY_REPO = os.getenv("INPUT_REGISTRY_REPO", "thepetk/registry")
-REMOVAL_DAYS_LIMIT = get_int_env_var("INPUT_REMOVAL_DEPRECATION_LIMIT", 365)
+REGISTRY_WORKERS = get_int_input("INPUT_REGISTRY_WORKERS", 4)
+REMOVAL_DAYS_LIMIT = get_int_input("INPUT_REMOVAL_DEPRECATION_LIMIT", 365)
+REPORT_PATH = os.getenv("INPUT_REPORT_PATH", "")
+SCAN_BUDGET_CALLS = get_int_input("INPUT_SCAN_BUDGET_CALLS", 0)
+SCAN_BUDGET_SECONDS = get_int_input("INPUT_SCAN_BUDGET_SECONDS", 0)
+SCAN_COVERAGE_RUNS = get_int_input("INPUT_SCAN_COVERAGE_RUNS", 7)
+SCAN_CURSOR_PATH = os.getenv("INPUT_SCAN_CURSOR_PATH", "drm_scan_cursor.json")
+# stacks parsed over the pool at once by a budgeted scan
+SCAN_PARSE_BATCH = 256
 STACKS_DIR = os.getenv("INPUT_STACKS_DIR", "stacks")
-TEST_MODE = get_int_env_var("TEST_MODE", 0)
+STACKS_SOURCE = os.getenv("INPUT_STACKS_SOURCE", "api")
+TEST_MODE = get_int_input("TEST_MODE", 0)
+VALIDATE_SCHEMA = get_int_input("INPUT_VALIDATE_SCHEMA", 0)
+WEBHOOK_SECRET = os.getenv("INPUT_WEBHOOK_SECRET", "")
 
 
 def get_logging_level():
@@ -115,11 +194,23 @@ class YAMLConfig:
 
 
 def get_YAML() -> YAML:
+    from ruamel.yaml import YAML
+
     _yaml = YAML()
     _config = YAMLConfig()
     return _config.config(_yaml)
 
 
+def get_composer_YAML() -> YAML:
+    """
+    returns a YAML instance used only to compose nodes, which uses the C based
+    parser when it is available.
+    """
+    from ruamel.yaml import YAML
+
+    return YAML(typ="safe", pure=False)
+
+
 @dataclass
 class RegistryRepoPR:
     """
@@ -134,6 +225,545 @@ class RegistryRepoPR:
     file_sha: str
     title: str
     devfile_updated_content: str | None = None
+    # builds the devfile_updated_content on demand, for stacks which content
+    # is not kept in memory
+    content_builder: Callable[[], str] | None = field(
+        default=None, repr=False, compare=False
+    )
+
+    def get_devfile_updated_content(self) -> str | None:
+        if self.devfile_updated_content is None and self.content_builder is not None:
+            self.devfile_updated_content = self.content_builder()
+        return self.devfile_updated_content
+
+
+class CassetteResponse:
+    """
+    mimics the httplib response object PyGithub expects from a connection.
+    """
+
+    def __init__(self, status: int, headers: dict[str, str], output: str) -> None:
+        self.status = status
+        self.headers = headers
+        self.output = output
+
+    def getheaders(self) -> Any:
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.output
+
+
+class Cassette:
+    """
+    records the github API traffic of a run to a gzipped json lines file and
+    replays it deterministically. It hooks below the PyGithub Requester, by
+    injecting its own connection classes.
+    """
+
+    # response headers kept in the cassette, all others are dropped.
+    KEPT_HEADERS = ("etag", "last-modified", "link", "location", "x-oauth-scopes")
+    KEPT_HEADER_PREFIXES = ("x-ratelimit-",)
+    VERSION = 1
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # the time the run was recorded at, planning replays against it
+        self.now = datetime.now()
+        self.interactions: list[dict[str, Any]] = []
+        self._replay: dict[tuple[str, str, str | None], deque[dict[str, Any]]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        cassette = cls(path)
+        try:
+            with gzip.open(path, "rt") as f:
+                header = json.loads(f.readline())
+                if header.get("version") != cls.VERSION:
+                    raise CriticalException(
+                        "unsupported cassette version {}".format(header.get("version"))
+                    )
+                if "now" in header:
+                    cassette.now = datetime.fromisoformat(header["now"])
+                for line in f:
+                    cassette.add(json.loads(line))
+        except OSError as err:
+            raise CriticalException("cannot load cassette {}:: {}".format(path, err))
+        return cassette
+
+    def save(self) -> None:
+        with gzip.open(self.path, "wt") as f:
+            header = {"version": self.VERSION, "now": self.now.isoformat()}
+            f.write(json.dumps(header) + "\n")
+            for interaction in self.interactions:
+                f.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+
+    def _key(self, verb: str, url: str, body: Any) -> tuple[str, str, str | None]:
+        return (verb, url, None if body is None else str(body))
+
+    def add(self, interaction: dict[str, Any]) -> None:
+        self.interactions.append(interaction)
+        key = self._key(interaction["v"], interaction["u"], interaction["b"])
+        self._replay.setdefault(key, deque()).append(interaction)
+
+    def record(self, verb: str, url: str, body: Any, response: Any) -> None:
+        headers = {
+            k.lower(): v
+            for k, v in response.getheaders()
+            if k.lower() in self.KEPT_HEADERS
+            or k.lower().startswith(self.KEPT_HEADER_PREFIXES)
+        }
+        self.add(
+            {
+                "v": verb,
+                "u": url,
+                "b": None if body is None else str(body),
+                "s": response.status,
+                "h": headers,
+                "o": response.read(),
+            }
+        )
+
+    def play(self, verb: str, url: str, body: Any) -> CassetteResponse:
+        """
+        returns the next recorded response for the given request. Identical
+        requests are replayed in the order they were recorded.
+        """
+        queue = self._replay.get(self._key(verb, url, body))
+        if not queue:
+            raise CriticalException(
+                "no recorded response found for {} {}".format(verb, url)
+            )
+        interaction = queue.popleft()
+        return CassetteResponse(interaction["s"], interaction["h"], interaction["o"])
+
+    def call_counts(self) -> Counter[str]:
+        """
+        counts the recorded API calls per verb and path.
+        """
+        return Counter(
+            "{} {}".format(i["v"], urlsplit(i["u"]).path) for i in self.interactions
+        )
+
+    def connection_classes(
+        self, mode: Literal["record", "replay"]
+    ) -> tuple[type[HTTPRequestsConnectionClass], type[HTTPSRequestsConnectionClass]]:
+        """
+        creates the connection classes to be injected to the PyGithub Requester.
+        """
+        from github.Requester import (
+            HTTPRequestsConnectionClass,
+            HTTPSRequestsConnectionClass,
+        )
+
+        cassette = self
+
+        def handle(conn: Any, send: Any) -> Any:
+            if mode == "replay":
+                return cassette.play(conn.verb, conn.url, conn.input)
+            response = send()
+            cassette.record(conn.verb, conn.url, conn.input, response)
+            return response
+
+        class CassetteHTTPConnection(HTTPRequestsConnectionClass):
+            def getresponse(self) -> Any:
+                return handle(self, super().getresponse)
+
+        class CassetteHTTPSConnection(HTTPSRequestsConnectionClass):
+            def getresponse(self) -> Any:
+                return handle(self, super().getresponse)
+
+        return CassetteHTTPConnection, CassetteHTTPSConnection
+
+
+# the mode and the time of the cassette in use, if any
+_cassette_mode = ""
+_cassette_now: datetime | None = None
+
+
+def get_now() -> datetime:
+    """
+    gets the current time, frozen to the recording time under a cassette so
+    replayed runs plan the same PRs as the recorded one.
+    """
+    return datetime.now() if _cassette_now is None else _cassette_now
+
+
+@contextmanager
+def use_cassette(mode: str, path: str) -> Iterator[Cassette | None]:
+    """
+    records or replays all github API calls made inside the context, depending
+    on the given mode. Any other mode leaves the github traffic untouched.
+    """
+    if mode not in ("record", "replay"):
+        yield None
+        return
+
+    from github.Requester import Requester
+
+    global _cassette_mode, _cassette_now
+    cassette = Cassette.load(path) if mode == "replay" else Cassette(path)
+    Requester.injectConnectionClasses(*cassette.connection_classes(mode))  # type: ignore # noqa: E501
+    _cassette_mode = mode
+    _cassette_now = cassette.now
+    logging.info("Using cassette {} in {} mode".format(path, mode))
+    try:
+        yield cassette
+    finally:
+        Requester.resetConnectionClasses()
+        _cassette_mode = ""
+        _cassette_now = None
+        if mode == "record":
+            cassette.save()
+        for call, count in sorted(cassette.call_counts().items()):
+            logging.debug("{} calls:: {}".format(count, call))
+        logging.info(
+            "{} API calls found in cassette {}".format(len(cassette.interactions), path)
+        )
+
+
+class StepJournal:
+    """
+    a journal of the PR creation steps, keyed by branch name. Each step is
+    appended and synced to disk once done, so a run stopped halfway through a
+    PR is resumed by the next one, instead of its branch being skipped. With
+    an empty path the journal is only kept in memory.
+    """
+
+    STEPS = ("started", "branch", "commit", "pr")
+
+    def __init__(self, path: str = "") -> None:
+        self.path = path
+        self.steps: dict[str, set[str]] = {}
+        if path != "" and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # the last line may be cut short by a crash
+                    continue
+                self.steps.setdefault(entry["branch"], set()).add(entry["step"])
+        # finished PRs are dropped, so only the pending ones are kept
+        self.steps = {b: steps for b, steps in self.steps.items() if "pr" not in steps}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for branch, steps in self.steps.items():
+                for step in self.STEPS:
+                    if step in steps:
+                        f.write(json.dumps({"branch": branch, "step": step}) + "\n")
+        os.replace(tmp_path, self.path)
+        if len(self.steps) > 0:
+            logging.info("{} pending PRs found in journal".format(len(self.steps)))
+
+    def pending(self, branch: str) -> bool:
+        return branch in self.steps and "pr" not in self.steps[branch]
+
+    def done(self, branch: str, step: str) -> bool:
+        return step in self.steps.get(branch, set())
+
+    def record(self, branch: str, step: str) -> None:
+        if self.done(branch, step):
+            return
+
+        self.steps.setdefault(branch, set()).add(step)
+        if self.path == "":
+            return
+
+        with open(self.path, "a") as f:
+            f.write(json.dumps({"branch": branch, "step": step}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+@dataclass
+class ScanCursor:
+    """
+    the position of a budgeted scan, persisted between runs. Stacks are
+    scanned in path order, starting after the last path scanned. The due
+    stacks left without a PR by the last run are pending, and are scanned
+    first by the next one.
+    """
+
+    path: str = ""
+    tree_sha: str = ""
+    pending: list[str] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: str) -> ScanCursor:
+        if path == "" or not os.path.exists(path):
+            return cls()
+
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str) -> None:
+        if path == "":
+            return
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"path": self.path, "tree_sha": self.tree_sha, "pending": self.pending},
+                f,
+            )
+        os.replace(tmp_path, path)
+
+
+class ScanBudget:
+    """
+    limits a scan by the seconds since the budget was created and by the API
+    calls made, 0 meaning no limit. To cover every stack within the given
+    coverage runs, a share of the stacks is scanned even if it overruns the
+    budget.
+    """
+
+    def __init__(
+        self, seconds: int = 0, calls: int = 0, coverage_runs: int = 0
+    ) -> None:
+        self.seconds = seconds
+        self.calls = calls
+        self.coverage_runs = coverage_runs
+        self.started = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return self.seconds > 0 or self.calls > 0
+
+    def min_stacks(self, total: int) -> int:
+        if self.coverage_runs <= 0:
+            return 0
+        return math.ceil(total / self.coverage_runs)
+
+    def spent(self, scanned: int, total: int, calls: int = 0) -> bool:
+        if not self.limited or scanned < self.min_stacks(total):
+            return False
+        if self.seconds > 0 and time.monotonic() - self.started >= self.seconds:
+            return True
+        return self.calls > 0 and calls >= self.calls
+
+
+class ExpiryIndex:
+    """
+    the next due date of every stack, i.e. the date it reaches the
+    deprecation or removal limit, persisted between runs as a json lines file
+    sorted by due date. A stack whose devfile is unchanged and isn't due yet
+    doesn't need to be fetched and checked again. With an empty path the
+    index is disabled.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: str = "",
+        deprecation_days_limit: int = DEPRECATION_DAYS_LIMIT,
+        removal_days_limit: int = REMOVAL_DAYS_LIMIT,
+    ) -> None:
+        self.path = path
+        self.deprecation_days_limit = deprecation_days_limit
+        self.removal_days_limit = removal_days_limit
+        # devfile path -> (devfile sha, due epoch)
+        self.entries: dict[str, tuple[str, float]] = {}
+        if path != "" and os.path.exists(path):
+            self._load()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path != ""
+
+    def _header(self) -> dict[str, int]:
+        return {
+            "version": self.VERSION,
+            "deprecation_days_limit": self.deprecation_days_limit,
+            "removal_days_limit": self.removal_days_limit,
+        }
+
+    def _load(self) -> None:
+        with open(self.path) as f:
+            header = json.loads(f.readline() or "{}")
+            # due dates computed with other limits can't be trusted
+            if header != self._header():
+                logging.info(
+                    "Expiry index {} is outdated, rebuilding".format(self.path)
+                )
+                return
+
+            for line in f:
+                entry = json.loads(line)
+                self.entries[entry["path"]] = (entry["sha"], entry["due"])
+
+    def save(self, paths: set[str]) -> None:
+        """
+        writes the index, dropping the entries of the devfiles not found in
+        the given paths anymore.
+        """
+        if not self.enabled:
+            return
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(json.dumps(self._header()) + "\n")
+            for path, (sha, due) in sorted(
+                self.entries.items(), key=lambda e: (e[1][1], e[0])
+            ):
+                if path in paths:
+                    f.write(json.dumps({"due": due, "path": path, "sha": sha}) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self, path: str, sha: str, now_epoch: float) -> bool:
+        """
+        checks if the devfile is unchanged since it was indexed and not due yet.
+        """
+        entry = self.entries.get(path)
+        return entry is not None and entry[0] == sha and entry[1] > now_epoch
+
+    def update(self, stack: RegistryStack) -> None:
+        if not self.enabled:
+            return
+
+        days_limit = (
+            self.removal_days_limit if stack.deprecated else self.deprecation_days_limit
+        )
+        self.entries[stack.devfile_path] = (
+            stack.file_sha,
+            to_epoch(stack.last_modified) + days_limit * 86400,
+        )
+
+
+def git_blob_sha(content: bytes) -> str:
+    """
+    computes the sha git (and so github) assigns to a file with the given content.
+    """
+    import hashlib
+
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def is_devfile(path: str) -> bool:
+    return path.endswith(("/devfile.yaml", "/devfile.yml"))
+
+
+def is_owners_file(path: str, stacks_dir: str = STACKS_DIR) -> bool:
+    # exclude the stack/OWNERS as it matches all devfiles fetched.
+    return path.lower().endswith("/owners") and path != "{}/OWNERS".format(stacks_dir)
+
+
+@dataclass
+class RepoFile:
+    """
+    a file read from a snapshot of the registry repo. It has the same
+    attributes the provider uses from a ContentFile.
+    """
+
+    path: str
+    sha: str
+    decoded_content: bytes
+    # set when the source knows the date already, in DATETIME_STRFTIME_FORMAT
+    last_modified: str | None = None
+
+
+class GitMirror:
+    """
+    reads a local (bare) mirror of the registry repo. Blobs are read through a
+    single long-lived `git cat-file --batch` process, so no checkout or
+    process per file is needed.
+    """
+
+    def __init__(self, repo_path: str) -> None:
+        self.repo_path = repo_path
+        # the mirror may be owned by another user, e.g. a mounted workspace
+        self._cmd = ["git", "-c", "safe.directory=*", "-C", repo_path]
+        self._cat_file: Popen | None = None
+
+    def __enter__(self) -> "GitMirror":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._cat_file is not None:
+            self._cat_file.stdin.close()  # type: ignore
+            self._cat_file.wait()
+            self._cat_file = None
+
+    def _git(self, *args: str) -> bytes:
+        import subprocess
+
+        try:
+            return subprocess.run(
+                [*self._cmd, *args],
+                check=True,
+                capture_output=True,
+            ).stdout
+        except (OSError, subprocess.CalledProcessError) as err:
+            raise CriticalException(
+                "git {} failed for {}:: {}".format(
+                    args[0], self.repo_path, getattr(err, "stderr", err)
+                )
+            )
+
+    def read_blob(self, sha: str) -> bytes:
+        if self._cat_file is None:
+            import subprocess
+
+            self._cat_file = subprocess.Popen(
+                [*self._cmd, "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+            )
+        stdin, stdout = self._cat_file.stdin, self._cat_file.stdout
+        stdin.write(sha.encode() + b"\n")  # type: ignore
+        stdin.flush()  # type: ignore
+        header = stdout.readline().split()  # type: ignore
+        if len(header) != 3:
+            raise CriticalException(
+                "blob {} not found in {}".format(sha, self.repo_path)
+            )
+        content = stdout.read(int(header[2]))  # type: ignore
+        stdout.read(1)  # type: ignore
+        return content
+
+    def list_files(self, ref: str, path: str) -> list[tuple[str, str]]:
+        """
+        lists the (path, blob sha) of all files under the path at the given ref.
+        """
+        files: list[tuple[str, str]] = []
+        for entry in self._git("ls-tree", "-r", "-z", ref, "--", path).split(b"\0"):
+            if not entry:
+                continue
+            info, file_path = entry.split(b"\t", 1)
+            _, _type, sha = info.split()
+            if _type == b"blob":
+                files.append((file_path.decode(), sha.decode()))
+        return files
+
+    def last_modified(self, ref: str, path: str) -> dict[str, int]:
+        """
+        finds the commit time of the last commit touching each file under the
+        path, walking the history once.
+        """
+        dates: dict[str, int] = {}
+        commit_time = 0
+        output = self._git(
+            "log", "--format=%x00%ct", "--name-only", "-z", ref, "--", path
+        )
+        # each commit is written as "\0<time>\0\n<path>\0<path>\0...", so its
+        # time is the token found after an empty one
+        time_next = False
+        for token in output.split(b"\0"):
+            if time_next:
+                commit_time = int(token)
+                time_next = False
+            elif token == b"":
+                time_next = True
+            elif token.strip(b"\n") != b"":
+                dates.setdefault(token.lstrip(b"\n").decode(), commit_time)
+        return dates
 
 
 class RegistryStack:
@@ -148,9 +778,10 @@ class RegistryStack:
         last_modified: str,
         file_sha: str,
         owners_content: str | None,
+        stacks_dir: str = STACKS_DIR,
     ) -> None:
         self.yaml = get_YAML()
-        self.name = self._get_stack_name(path)
+        self.name = self._get_stack_name(path, stacks_dir)
         self.devfile_path = path
         self.devfile_content = raw_content
         self.last_modified = self._get_last_modified(last_modified)
@@ -161,9 +792,32 @@ class RegistryStack:
     def __repr__(self) -> str:
         return "RegistryStack(name='{}')".format(self.name)
 
-    def _get_stack_name(self, path: str) -> str:
+    @classmethod
+    def from_facts(
+        cls,
+        facts: StackFacts,
+        raw_content: str,
+        last_modified: str,
+        file_sha: str,
+        stacks_dir: str = STACKS_DIR,
+    ) -> RegistryStack:
+        """
+        builds the stack from facts parsed beforehand, skipping the yaml parsing.
+        """
+        stack = cls.__new__(cls)
+        stack.yaml = get_YAML()
+        stack.name = stack._get_stack_name(facts.path, stacks_dir)
+        stack.devfile_path = facts.path
+        stack.devfile_content = raw_content
+        stack.last_modified = stack._get_last_modified(last_modified)
+        stack.deprecated = facts.deprecated
+        stack.file_sha = file_sha
+        stack.owners = facts.owners
+        return stack
+
+    def _get_stack_name(self, path: str, stacks_dir: str = STACKS_DIR) -> str:
         return (
-            path.replace("{}/".format(STACKS_DIR), "")
+            path.replace("{}/".format(stacks_dir), "")
             .replace("/devfile.yaml", "")
             .replace("/devfile.yml", "")
         )
@@ -185,49 +839,418 @@ class RegistryStack:
         if owners_content is None:
             return []
 
-        owners_dict: dict[str, Any] = self.yaml.load(owners_content)
-        return owners_dict.get("reviewers", [])
+        # an empty file or reviewers key loads as None
+        owners_dict: dict[str, Any] = self.yaml.load(owners_content) or {}
+        return owners_dict.get("reviewers") or []
+
+
+@dataclass
+class StackFacts:
+    """
+    the fields of a stack parsed from its devfile and OWNERS file. A stack
+    having a metadata error cannot be checked, while one only having schema
+    or OWNERS errors still is.
+    """
+
+    path: str
+    deprecated: bool
+    owners: list[str]
+    error: str | None = None
+    schema_errors: list[str] = field(default_factory=list)
+    owners_error: str | None = None
+
+
+# the compiled schema validators of a process, by schema path
+_schema_validators: dict[str, Any] = {}
+
+
+def get_devfile_validator(schema_path: str) -> Any:
+    """
+    returns the validator of the devfile schema found at the path. It is
+    compiled on first use and reused for all stacks parsed by the process.
+    """
+    validator = _schema_validators.get(schema_path)
+    if validator is not None:
+        return validator
+
+    try:
+        from jsonschema import SchemaError, validators
+    except ImportError:
+        raise CriticalException("jsonschema is required to validate devfiles")
+    try:
+        with open(schema_path) as f:
+            schema = json.load(f)
+        validator_class = validators.validator_for(schema)
+        validator_class.check_schema(schema)
+    except (OSError, ValueError, SchemaError) as err:
+        raise CriticalException(
+            "invalid devfile schema {}:: {}".format(schema_path, str(err))
+        )
+    validator = _schema_validators[schema_path] = validator_class(schema)
+    return validator
+
+
+def parse_owners(
+    _yaml: YAML, owners_content: bytes | None
+) -> tuple[list[str], str | None]:
+    """
+    parses the reviewers of an OWNERS file. A broken file gives no owners
+    along with its error, so it doesn't prevent the stack from being checked.
+    """
+    from ruamel.yaml import YAMLError
+
+    if owners_content is None:
+        return [], None
+    try:
+        # an empty file or reviewers key loads as None
+        owners = (_yaml.load(owners_content) or {}).get("reviewers") or []
+        return [str(o) for o in owners], None
+    except (YAMLError, TypeError, AttributeError) as err:
+        return [], "{}: {}".format(type(err).__name__, err)
+
+
+def parse_stack_facts(
+    batch: Sequence[tuple[str, bytes, bytes | None]], schema_path: str = ""
+) -> list[StackFacts]:
+    """
+    parses a batch of (devfile path, devfile content, OWNERS content) tuples.
+    Only the facts are returned, so little data is sent back by the workers.
+    With a schema_path, each devfile is also validated against the schema.
+    A YAML instance isn't thread safe, so each batch gets its own one.
+    """
+    from ruamel.yaml import YAMLError
+
+    _yaml = get_YAML()
+    validator = None if schema_path == "" else get_devfile_validator(schema_path)
+
+    facts: list[StackFacts] = []
+    for path, devfile_content, owners_content in batch:
+        schema_errors: list[str] = []
+        try:
+            devfile = _yaml.load(devfile_content)
+            if validator is not None:
+                schema_errors = [
+                    "{}: {}".format(e.json_path, e.message)
+                    for e in sorted(
+                        validator.iter_errors(devfile), key=lambda e: e.json_path
+                    )
+                ]
+            tags = devfile["metadata"]["tags"]
+            owners, owners_error = parse_owners(_yaml, owners_content)
+            facts.append(
+                StackFacts(
+                    path=path,
+                    deprecated="deprecated" in [str(t).lower() for t in tags],
+                    owners=owners,
+                    schema_errors=schema_errors,
+                    owners_error=owners_error,
+                )
+            )
+        except (YAMLError, KeyError, TypeError, AttributeError) as err:
+            facts.append(
+                StackFacts(
+                    path=path,
+                    deprecated=False,
+                    owners=[],
+                    error="{}: {}".format(type(err).__name__, err),
+                    schema_errors=schema_errors,
+                )
+            )
+    return facts
+
+
+def get_parse_workers(workers: int = PARSE_WORKERS) -> int:
+    """
+    returns the number of parse worker processes, a worker per core for
+    workers < 0.
+    """
+    if workers < 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def parse_all_stack_facts(
+    items: Sequence[tuple[str, bytes, bytes | None]],
+    workers: int = PARSE_WORKERS,
+    chunk_size: int = PARSE_CHUNK_SIZE,
+    schema_path: str = "",
+    pool: Executor | None = None,
+) -> list[StackFacts]:
+    """
+    parses all the given stacks over a pool of worker processes, keeping their
+    order. Items are sent in chunks, so each worker gets a few large messages
+    instead of one per stack. With workers < 0 a worker per core is used. A
+    pool can be given to be reused across calls, otherwise one is created.
+    """
+    workers = get_parse_workers(workers)
+    if chunk_size <= 0:
+        # about 4 chunks per worker balance uneven stacks without many messages
+        chunk_size = max(16, math.ceil(len(items) / (max(workers, 1) * 4)))
+    chunks = [
+        items[start:end]
+        for start, end in zip(
+            range(0, len(items), chunk_size),
+            range(chunk_size, len(items) + chunk_size, chunk_size),
+        )
+    ]
+    if workers <= 1 or len(chunks) <= 1:
+        return parse_stack_facts(items, schema_path)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+
+    logging.debug(
+        "Parsing {} stacks in {} chunks over {} workers".format(
+            len(items), len(chunks), min(workers, len(chunks))
+        )
+    )
+    parse = partial(parse_stack_facts, schema_path=schema_path)
+    if pool is not None:
+        return [f for facts in pool.map(parse, chunks) for f in facts]
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        return [f for facts in pool.map(parse, chunks) for f in facts]
+
+
+class OwnersTable:
+    """
+    interns the owner logins of all stacks, so each login is stored once and
+    stacks only keep a tuple of integer ids.
+    """
+
+    def __init__(self) -> None:
+        self.ids: dict[str, int] = {}
+        self.logins: list[str] = []
+
+    def intern(self, owners: list[str]) -> tuple[int, ...]:
+        ids: list[int] = []
+        for owner in owners:
+            if owner not in self.ids:
+                self.ids[owner] = len(self.logins)
+                self.logins.append(sys.intern(str(owner)))
+            ids.append(self.ids[owner])
+        return tuple(ids)
+
+    def resolve(self, ids: tuple[int, ...]) -> list[str]:
+        return [self.logins[i] for i in ids]
+
+
+class CompactRegistryStack:
+    """
+    a memory efficient RegistryStack, keeping only the fields needed to check
+    the stack. The devfile content is loaded on demand through the given
+    content_loader, so it is only fetched for stacks getting a PR.
+    """
+
+    __slots__ = (
+        "name",
+        "devfile_path",
+        "file_sha",
+        "last_modified_epoch",
+        "deprecated",
+        "owner_ids",
+        "owners_table",
+        "content_loader",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        devfile_path: str,
+        file_sha: str,
+        last_modified_epoch: int,
+        deprecated: bool,
+        owner_ids: tuple[int, ...],
+        owners_table: OwnersTable,
+        content_loader: Callable[[str], str],
+    ) -> None:
+        self.name = name
+        self.devfile_path = devfile_path
+        self.file_sha = file_sha
+        self.last_modified_epoch = last_modified_epoch
+        self.deprecated = deprecated
+        self.owner_ids = owner_ids
+        self.owners_table = owners_table
+        self.content_loader = content_loader
+
+    def __repr__(self) -> str:
+        return "CompactRegistryStack(name='{}')".format(self.name)
+
+    @classmethod
+    def from_registry_stack(
+        cls,
+        stack: RegistryStack,
+        owners_table: OwnersTable,
+        content_loader: Callable[[str], str],
+    ) -> "CompactRegistryStack":
+        return cls(
+            name=stack.name,
+            devfile_path=stack.devfile_path,
+            file_sha=stack.file_sha,
+            last_modified_epoch=calendar.timegm(stack.last_modified.timetuple()),
+            deprecated=stack.deprecated,
+            owner_ids=owners_table.intern(stack.owners),
+            owners_table=owners_table,
+            content_loader=content_loader,
+        )
+
+    @property
+    def last_modified(self) -> datetime:
+        """
+        the last modified datetime (naive in UTC), same as the RegistryStack one.
+        """
+        return datetime.fromtimestamp(self.last_modified_epoch, timezone.utc).replace(
+            tzinfo=None
+        )
+
+    @property
+    def owners(self) -> list[str]:
+        return self.owners_table.resolve(self.owner_ids)
+
+    @property
+    def devfile_content(self) -> str:
+        return self.content_loader(self.devfile_path)
+
+
+def build_github_client(
+    token: str | None,
+    base_url: str = GITHUB_API_URL,
+    pool_size: int = GITHUB_POOL_SIZE,
+    per_page: int = GITHUB_PER_PAGE,
+    timeout: int = GITHUB_TIMEOUT,
+    retries: int = GITHUB_RETRIES,
+    throttle: bool = True,
+) -> Github:
+    """
+    builds the github client of a run, or of a registry in a multi-registry
+    run. Credentials are not checked here, they are validated by the first
+    real API response.
+    """
+    from github import Auth, Github
+    from github.GithubRetry import GithubRetry
+
+    kwargs: dict[str, Any] = {}
+    # github suggests to space requests out, only tests can skip it
+    if not throttle:
+        kwargs["seconds_between_requests"] = None
+        kwargs["seconds_between_writes"] = None
+
+    return Github(
+        auth=None if token is None else Auth.Token(token),
+        base_url=base_url,
+        pool_size=pool_size,
+        per_page=per_page,
+        timeout=timeout,
+        retry=GithubRetry(total=retries),
+        **kwargs,
+    )
+
+
+def get_github_client(
+    token: str = GITHUB_TOKEN, base_url: str = GITHUB_API_URL
+) -> Github:
+    logging.debug("Setting up github connection")
+    # Test cases and replayed runs should not authenticate github nor throttle
+    # requests
+    if TEST_MODE > 0 or _cassette_mode == "replay":
+        return build_github_client(None, base_url=base_url, throttle=False)
+
+    return build_github_client(token, base_url=base_url)
 
 
 class GithubProvider:
     """
-    manages all github API operations ran inside the script.
+    manages all github API operations ran inside the script. An existing
+    client can be given as gb, as long as it isn't used by other threads.
     """
 
     def __init__(
-        self, token: str = GITHUB_TOKEN, registry_url: str = REGISTRY_REPO
+        self,
+        token: str = GITHUB_TOKEN,
+        registry_url: str = REGISTRY_REPO,
+        base_url: str = GITHUB_API_URL,
+        stacks_source: str = STACKS_SOURCE,
+        local_mirror: str = LOCAL_MIRROR,
+        parse_workers: int = PARSE_WORKERS,
+        journal_path: str = JOURNAL_PATH,
+        scan_budget: ScanBudget | None = None,
+        scan_cursor_path: str = SCAN_CURSOR_PATH,
+        expiry_index_path: str = EXPIRY_INDEX_PATH,
+        stacks_dir: str = STACKS_DIR,
+        default_branch: str = DEFAULT_BRANCH,
+        deprecation_days_limit: int = DEPRECATION_DAYS_LIMIT,
+        removal_days_limit: int = REMOVAL_DAYS_LIMIT,
+        pr_creation_limit: int = PR_CREATION_LIMIT,
+        gb: Github | None = None,
+        devfile_schema_path: str = "",
+        skip_broken_stacks: bool = False,
     ) -> None:
-        self.gb = self._init_github(token)
-        self.registry_repo = self.gb.get_repo(registry_url)
+        self.base_url = base_url
+        self.default_branch = default_branch
+        self.deprecation_days_limit = deprecation_days_limit
+        self.removal_days_limit = removal_days_limit
+        self.pr_creation_limit = pr_creation_limit
+        self.stacks_dir = stacks_dir
+        self.expiry_index = ExpiryIndex(
+            expiry_index_path, deprecation_days_limit, removal_days_limit
+        )
+        self.journal = StepJournal(journal_path)
+        self.scan_budget = ScanBudget() if scan_budget is None else scan_budget
+        self.scan_cursor_path = scan_cursor_path
+        # the cursor of the last budgeted scan, saved once its PRs are created
+        self.scan_cursor: ScanCursor | None = None
+        self.stacks_source = stacks_source
+        self.local_mirror = local_mirror
+        self.parse_workers = parse_workers
+        # an empty path disables the schema validation
+        self.devfile_schema_path = devfile_schema_path
+        if devfile_schema_path != "":
+            get_devfile_validator(devfile_schema_path)
+        # stacks always go through the fact parsing, which skips broken ones
+        self.skip_broken_stacks = skip_broken_stacks
+        # devfile path -> errors of the stacks that failed parsing or validation
+        self.stack_errors: dict[str, list[str]] = {}
+        # branches of the PRs created or found already opened
+        self.handled_branches: set[str] = set()
+        self.gb = self._init_github(token) if gb is None else gb
+        self.registry_repo = self._get_registry_repo(registry_url)
 
     def _init_github(self, token: str) -> Github:
-        logging.debug("Setting up github connection")
-        _auth = Auth.Token(token)
-
-        # Test cases should not authenticate github
-        if TEST_MODE > 0:
-            return Github()
+        return get_github_client(token, self.base_url)
 
-        _g = Github(auth=_auth)
+    def _get_registry_repo(self, registry_url: str) -> Repository:
+        """
+        fetches the registry repo. As it is the first request of the run, it
+        also validates the given credentials.
+        """
+        from github.GithubException import BadCredentialsException
 
-        # check if given credentials are ok
         try:
-            _g.get_user().login
+            repo = self.gb.get_repo(registry_url)
         except BadCredentialsException:
             raise CriticalException("bad credentials given for github")
 
-        return Github(auth=_auth)
+        scopes = self.gb.oauth_scopes
+        if scopes is not None and not {"repo", "public_repo"} & set(scopes):
+            logging.warning(
+                "the token has no repo scope, PR creation may fail:: {}".format(
+                    ", ".join(scopes)
+                )
+            )
+        return repo
 
-    def _get_last_modified(self, item: ContentFile) -> str:
+    def _get_last_modified(self, item: ContentFile | RepoFile) -> str:
         """
         gets the datatime of the last commit related to this ContentFile.
         """
+        if isinstance(item, RepoFile) and item.last_modified is not None:
+            return item.last_modified
+
         _c = self.registry_repo.get_commits(path=item.path)
         commits = [commit for commit in _c]
         if len(commits) > 0:
             return "" if commits[0].last_modified is None else commits[0].last_modified
         else:
-            return datetime.strftime(datetime.now(), DATETIME_STRFTIME_FORMAT)
+            return datetime.strftime(get_now(), DATETIME_STRFTIME_FORMAT)
 
     def _get_repo_items(self, path: str) -> tuple[list[ContentFile], list[ContentFile]]:
         """
@@ -242,21 +1265,103 @@ class GithubProvider:
             # if the item fetched is a dir get its contents too.
             if item.type == "dir":
                 repo_items.extend(self.registry_repo.get_contents(item.path))  # type: ignore # noqa: E501
-            elif item.path.endswith(("/devfile.yaml", "/devfile.yml")):
+            elif is_devfile(item.path):
                 devfiles.append(item)
-            # exclude the stack/OWNERS as it matches all devfiles fetched.
-            elif item.path.lower().endswith("/owners") and item.path != "stacks/OWNERS":
+            elif is_owners_file(item.path, path):
                 owner_files.append(item)
         return devfiles, owner_files
 
+    def _get_archive_items(self, path: str) -> tuple[list[RepoFile], list[RepoFile]]:
+        """
+        downloads the default branch tarball once and streams through it,
+        keeping in memory only the devfiles and OWNERS files under the path.
+        The download is binary and doesn't go through the PyGithub connection
+        classes, so it can't be recorded or replayed by a cassette.
+        """
+        if _cassette_mode == "replay":
+            raise CriticalException(
+                "the archive stacks_source can't be replayed from a cassette"
+            )
+        if _cassette_mode == "record":
+            logging.warning("The archive download is not recorded in the cassette")
+
+        import tarfile
+        import urllib.request
+
+        devfiles: list[RepoFile] = []
+        owner_files: list[RepoFile] = []
+        url = self.registry_repo.get_archive_link("tarball", self.default_branch)
+        logging.info("Fetching repo archive")
+        prefix = path.rstrip("/") + "/"
+        with urllib.request.urlopen(url, timeout=GITHUB_TIMEOUT) as response:
+            with tarfile.open(fileobj=response, mode="r|gz") as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    # strip the "<owner>-<repo>-<sha>/" root dir of the archive
+                    member_path = member.name.split("/", 1)[-1]
+                    if not member_path.startswith(prefix):
+                        continue
+                    if is_devfile(member_path):
+                        items = devfiles
+                    elif is_owners_file(member_path, path):
+                        items = owner_files
+                    else:
+                        continue
+                    content = archive.extractfile(member).read()  # type: ignore
+                    items.append(
+                        RepoFile(
+                            path=member_path,
+                            sha=git_blob_sha(content),
+                            decoded_content=content,
+                        )
+                    )
+        return devfiles, owner_files
+
+    def _get_git_items(self, path: str) -> tuple[list[RepoFile], list[RepoFile]]:
+        """
+        reads the devfiles and OWNERS files under the path from the local
+        mirror, along with the last modified date of each one.
+        """
+        if self.local_mirror == "":
+            raise CriticalException("local_mirror is required for the git source")
+
+        devfiles: list[RepoFile] = []
+        owner_files: list[RepoFile] = []
+        logging.info("Reading repo files from {}".format(self.local_mirror))
+        with GitMirror(self.local_mirror) as mirror:
+            dates = mirror.last_modified(self.default_branch, path)
+            for file_path, sha in mirror.list_files(self.default_branch, path):
+                if is_devfile(file_path):
+                    items = devfiles
+                elif is_owners_file(file_path, path):
+                    items = owner_files
+                else:
+                    continue
+                items.append(
+                    RepoFile(
+                        path=file_path,
+                        sha=sha,
+                        decoded_content=mirror.read_blob(sha),
+                        last_modified=datetime.fromtimestamp(
+                            dates.get(file_path, 0), timezone.utc
+                        ).strftime(DATETIME_STRFTIME_FORMAT),
+                    )
+                )
+        return devfiles, owner_files
+
     def _get_matched_devfile_owners(
-        self, raw_devfiles: list[ContentFile], raw_owner_files: list[ContentFile]
-    ) -> list[tuple[ContentFile, ContentFile | None]]:
+        self,
+        raw_devfiles: Sequence[ContentFile | RepoFile],
+        raw_owner_files: Sequence[ContentFile | RepoFile],
+    ) -> list[tuple[ContentFile | RepoFile, ContentFile | RepoFile | None]]:
         """
         matches every devfile fetched from the registry repo with an OWNERS file.
         If there is no OWNERS file found it matches a NoneType.
         """
-        _matchings: list[tuple[ContentFile, ContentFile | None]] = []
+        _matchings: list[
+            tuple[ContentFile | RepoFile, ContentFile | RepoFile | None]
+        ] = []
         for raw_devfile in raw_devfiles:
             _matched = False
             for raw_owner_file in raw_owner_files:
@@ -268,15 +1373,167 @@ class GithubProvider:
                 _matchings.append((raw_devfile, None))
         return _matchings
 
-    def get_stacks(self, path: str = STACKS_DIR) -> list[RegistryStack]:
+    def get_stacks(self, path: str | None = None) -> list[RegistryStack]:
         """
         gets all stack versions from the registry and converts them into a list
         of RegistryStack objects.
         """
-        raw_devfiles, raw_owner_files = self._get_repo_items(path)
-        _matchings = self._get_matched_devfile_owners(raw_devfiles, raw_owner_files)
-        return [
-            RegistryStack(
+        return list(self._iter_stacks(self.stacks_dir if path is None else path))
+
+    def _iter_stacks(self, path: str) -> Iterator[RegistryStack]:
+        """
+        yields the RegistryStack objects one by one, releasing each fetched
+        devfile once it has been converted. With an expiry index, only the
+        stacks due or changed since indexed are fetched.
+        """
+        raw_devfiles: Sequence[ContentFile | RepoFile]
+        raw_owner_files: Sequence[ContentFile | RepoFile]
+        if self.stacks_source == "archive":
+            raw_devfiles, raw_owner_files = self._get_archive_items(path)
+        elif self.stacks_source == "git":
+            raw_devfiles, raw_owner_files = self._get_git_items(path)
+        else:
+            raw_devfiles, raw_owner_files = self._get_repo_items(path)
+        _matchings = deque(
+            self._get_matched_devfile_owners(raw_devfiles, raw_owner_files)
+        )
+        del raw_devfiles
+        paths = {raw_devfile.path for raw_devfile, _ in _matchings}
+        if self.expiry_index.enabled:
+            now_epoch = to_epoch(get_now())
+            _matchings = deque(
+                m
+                for m in _matchings
+                if not self.expiry_index.is_fresh(m[0].path, m[0].sha, now_epoch)
+            )
+            logging.info(
+                "{} of {} stacks are due or changed since indexed".format(
+                    len(_matchings), len(paths)
+                )
+            )
+
+        stacks = (
+            self._iter_budgeted_stacks(_matchings)
+            if self.scan_budget.limited
+            else self._iter_matched_stacks(_matchings)
+        )
+        for stack in stacks:
+            self.expiry_index.update(stack)
+            yield stack
+        self.expiry_index.save(paths)
+
+    def _iter_budgeted_stacks(
+        self,
+        matchings: deque[tuple[ContentFile | RepoFile, ContentFile | RepoFile | None]],
+    ) -> Iterator[RegistryStack]:
+        """
+        yields the pending stacks of the saved scan cursor, then the others in
+        path order, starting after the cursor, until the scan budget is spent.
+        Pending stacks don't count for the coverage of the scan. The cursor is
+        only kept in scan_cursor, it is saved by save_scan_cursor once the PRs
+        are created, so the next run continues from there.
+        """
+        cursor = ScanCursor.load(self.scan_cursor_path)
+        tree_sha = self.registry_repo.get_branch(
+            self.default_branch
+        ).commit.commit.tree.sha
+        if cursor.tree_sha not in ("", tree_sha):
+            logging.info("Registry changed since the last scan")
+        # the calls are counted through the rate limit, so no request is made
+        calls_left = self.gb.rate_limiting[0] if self.scan_budget.calls > 0 else 0
+
+        pending = set(cursor.pending)
+        ordered = sorted(matchings, key=lambda m: m[0].path)
+        matchings.clear()
+        first = [m for m in ordered if m[0].path in pending]
+        ordered = [m for m in ordered if m[0].path not in pending]
+        start = bisect.bisect_right([m[0].path for m in ordered], cursor.path)
+        ring = deque(first + ordered[start:] + ordered[:start])
+        del ordered
+
+        total = len(ring)
+        pending_left = len(first)
+        scanned = 0
+        # the pool parses a batch of stacks at a time, and is kept for the
+        # whole scan
+        batch_size = 1 if self.parse_workers == 0 else SCAN_PARSE_BATCH
+        with self._parse_pool() as pool:
+            while len(ring) > 0 and not self.scan_budget.spent(
+                scanned,
+                total,
+                (
+                    calls_left - self.gb.rate_limiting[0]
+                    if self.scan_budget.calls > 0
+                    else 0
+                ),
+            ):
+                batch = deque(ring.popleft() for _ in range(min(batch_size, len(ring))))
+                batch_pending = min(pending_left, len(batch))
+                pending_left -= batch_pending
+                if len(batch) > batch_pending:
+                    cursor = ScanCursor(path=batch[-1][0].path, tree_sha=tree_sha)
+                scanned += len(batch) - batch_pending
+                yield from self._iter_matched_stacks(batch, pool)
+
+        self.scan_cursor = cursor
+        logging.info(
+            "Scanned {} pending and {} of {} stacks, the next scan starts after {}".format(  # noqa: E501
+                len(first), scanned, total, cursor.path
+            )
+        )
+
+    def save_scan_cursor(self, prs: list[RegistryRepoPR]) -> None:
+        """
+        saves the cursor of the last budgeted scan once the given PRs were
+        created. Their stacks left without a PR, e.g. past the
+        pr_creation_limit, are pending for the next run. A plan doesn't save
+        the cursor, so it doesn't move the scan.
+        """
+        if self.scan_cursor is None:
+            return
+
+        self.scan_cursor.pending = sorted(
+            pr.filepath for pr in prs if pr.branch_name not in self.handled_branches
+        )
+        self.scan_cursor.save(self.scan_cursor_path)
+
+    @contextmanager
+    def _parse_pool(self) -> Iterator[Executor | None]:
+        """
+        runs a pool of parse workers shared by several parsings, if any worker
+        is set.
+        """
+        workers = get_parse_workers(self.parse_workers)
+        if workers <= 1:
+            yield None
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield pool
+
+    def _iter_matched_stacks(
+        self,
+        matchings: deque[tuple[ContentFile | RepoFile, ContentFile | RepoFile | None]],
+        pool: Executor | None = None,
+    ) -> Iterator[RegistryStack]:
+        """
+        yields the RegistryStack objects of the matched devfiles, parsing them
+        over the parse workers if any. Validated stacks, and all of them when
+        broken stacks are skipped, go through the same parsing.
+        """
+        if (
+            self.parse_workers != 0
+            or self.devfile_schema_path != ""
+            or self.skip_broken_stacks
+        ):
+            yield from self._iter_parsed_stacks(matchings, pool)
+            return
+
+        while len(matchings) > 0:
+            raw_devfile, raw_owner_file = matchings.popleft()
+            yield RegistryStack(
                 path=raw_devfile.path,
                 last_modified=self._get_last_modified(raw_devfile),
                 file_sha=raw_devfile.sha,
@@ -286,8 +1543,114 @@ class GithubProvider:
                     if raw_owner_file is None
                     else raw_owner_file.decoded_content.decode()
                 ),
+                stacks_dir=self.stacks_dir,
+            )
+
+    def _iter_parsed_stacks(
+        self,
+        matchings: deque[tuple[ContentFile | RepoFile, ContentFile | RepoFile | None]],
+        pool: Executor | None = None,
+    ) -> Iterator[RegistryStack]:
+        """
+        parses all matched devfiles over the parse workers first, then yields
+        the stacks built from the parsed facts. Stacks with metadata errors are
+        skipped and, along with the schema errors, kept in the stack_errors.
+        """
+        facts = deque(
+            parse_all_stack_facts(
+                [
+                    (
+                        raw_devfile.path,
+                        raw_devfile.decoded_content,
+                        (
+                            None
+                            if raw_owner_file is None
+                            else raw_owner_file.decoded_content
+                        ),
+                    )
+                    for raw_devfile, raw_owner_file in matchings
+                ],
+                workers=self.parse_workers,
+                schema_path=self.devfile_schema_path,
+                pool=pool,
             )
-            for raw_devfile, raw_owner_file in _matchings
+        )
+        while len(matchings) > 0:
+            raw_devfile, _ = matchings.popleft()
+            stack_facts = facts.popleft()
+            if len(stack_facts.schema_errors) > 0:
+                logging.warning(
+                    "Stack {} doesn't match the devfile schema:: {}".format(
+                        raw_devfile.path, "; ".join(stack_facts.schema_errors)
+                    )
+                )
+                self.stack_errors[raw_devfile.path] = list(stack_facts.schema_errors)
+            if stack_facts.owners_error is not None:
+                logging.warning(
+                    "OWNERS of stack {} can't be parsed:: {}".format(
+                        raw_devfile.path, stack_facts.owners_error
+                    )
+                )
+                self.stack_errors.setdefault(raw_devfile.path, []).append(
+                    stack_facts.owners_error
+                )
+            if stack_facts.error is not None:
+                logging.error(
+                    "Skipping stack {}:: {}".format(raw_devfile.path, stack_facts.error)
+                )
+                self.stack_errors.setdefault(raw_devfile.path, []).append(
+                    stack_facts.error
+                )
+                continue
+
+            yield RegistryStack.from_facts(
+                stack_facts,
+                raw_content=raw_devfile.decoded_content.decode(),
+                last_modified=self._get_last_modified(raw_devfile),
+                file_sha=raw_devfile.sha,
+                stacks_dir=self.stacks_dir,
+            )
+
+    def get_devfile_content(self, path: str) -> str:
+        """
+        fetches the content of a single devfile from the default branch.
+        """
+        devfile: ContentFile = self.registry_repo.get_contents(path, ref=self.default_branch)  # type: ignore # noqa: E501
+        return devfile.decoded_content.decode()
+
+    def get_stack(
+        self, path: str, last_modified: str, owners: list[str] | None = None
+    ) -> RegistryStack:
+        """
+        fetches a single stack from the default branch, e.g. once a push changed
+        its devfile. The last modified date and the owners are given, so only
+        the devfile is requested.
+        """
+        devfile: ContentFile = self.registry_repo.get_contents(path, ref=self.default_branch)  # type: ignore # noqa: E501
+        stack = RegistryStack(
+            path=path,
+            raw_content=devfile.decoded_content.decode(),
+            last_modified=last_modified,
+            file_sha=devfile.sha,
+            owners_content=None,
+            stacks_dir=self.stacks_dir,
+        )
+        stack.owners = [] if owners is None else owners
+        return stack
+
+    def get_compact_stacks(
+        self, path: str | None = None, owners_table: OwnersTable | None = None
+    ) -> list[CompactRegistryStack]:
+        """
+        gets all stack versions from the registry as CompactRegistryStack objects.
+        Devfile contents are dropped after parsing and fetched again on demand.
+        """
+        owners_table = OwnersTable() if owners_table is None else owners_table
+        return [
+            CompactRegistryStack.from_registry_stack(
+                stack, owners_table, self.get_devfile_content
+            )
+            for stack in self._iter_stacks(self.stacks_dir if path is None else path)
         ]
 
     def _deprecate_file(self, pr: RegistryRepoPR) -> None:
@@ -297,7 +1660,7 @@ class GithubProvider:
         self.registry_repo.update_file(
             pr.filepath,
             pr.commit_message,
-            pr.devfile_updated_content,  # type: ignore
+            pr.get_devfile_updated_content(),  # type: ignore
             pr.file_sha,
             pr.branch_name,
         )
@@ -314,6 +1677,8 @@ class GithubProvider:
         )
 
     def _branch_already_exists(self, branch_name: str) -> bool:
+        from github.GithubException import GithubException
+
         try:
             _ = self.registry_repo.get_branch(branch_name)
         except GithubException:
@@ -324,67 +1689,212 @@ class GithubProvider:
         """
         creates a branch for the given RegistryRepoPR object.
         """
-        base = self.registry_repo.get_branch(DEFAULT_BRANCH)
+        base = self.registry_repo.get_branch(self.default_branch)
         _ = self.registry_repo.create_git_ref(
             ref="refs/heads/" + pr.branch_name, sha=base.commit.sha
         )
 
+    def _file_committed(self, pr: RegistryRepoPR) -> bool:
+        """
+        checks if the file of the pr has already been changed in its branch.
+        """
+        from github.GithubException import GithubException
+
+        try:
+            content: ContentFile = self.registry_repo.get_contents(pr.filepath, ref=pr.branch_name)  # type: ignore # noqa: E501
+        except GithubException as err:
+            if err.status == 404:
+                return pr.action == "remove"
+            raise
+        return content.sha != pr.file_sha
+
+    def _pr_exists(self, pr: RegistryRepoPR) -> bool:
+        pulls = self.registry_repo.get_pulls(
+            state="open",
+            head="{}:{}".format(self.registry_repo.owner.login, pr.branch_name),
+            base=self.default_branch,
+        )
+        return next(iter(pulls), None) is not None
+
     def _create_pr(self, pr: RegistryRepoPR):
         """
         creates a pull request for the given RegistryRepoPR object.
         """
         logging.info("creating pr for {} branch".format(pr.branch_name))
         _ = self.registry_repo.create_pull(
-            base=DEFAULT_BRANCH,
+            base=self.default_branch,
             head=pr.branch_name,
             title=pr.title,
             body=pr.description,
         )
 
-    def create_prs(self, prs: list[RegistryRepoPR]):
+    def create_prs(self, prs: list[RegistryRepoPR]) -> int:
         """
-        creates all prs for the given list RegistryRepoPR objects.
-        Skips if the PR_CREATION_LIMIT has been reached.
+        creates all prs for the given list RegistryRepoPR objects and returns
+        the number created. Skips if the pr_creation_limit has been reached.
         """
+        from github.GithubException import GithubException
+
         _prs_created = 0
         for pr in prs:
-            if _prs_created >= PR_CREATION_LIMIT:
+            if _prs_created >= self.pr_creation_limit:
                 logging.warn("PR creation limit is reached. Skipping")
                 break
 
-            if self._branch_already_exists(pr.branch_name):
-                logging.warning(
-                    "branch {} already exists. Skipping pr".format(pr.branch_name)
-                )
+            # a pending branch was left halfway by a previous run, the steps
+            # not found in the journal are checked against the repo, as a run
+            # may have stopped right after a step and before recording it.
+            branch = pr.branch_name
+            resuming = self.journal.pending(branch)
+            if not resuming and self._branch_already_exists(branch):
+                logging.warning("branch {} already exists. Skipping pr".format(branch))
+                self.handled_branches.add(branch)
                 continue
             try:
-                self._create_branch(pr)
-
-                if pr.action == "deprecate":
-                    self._deprecate_file(pr)
-                else:
-                    self._remove_file(pr)
-
-                self._create_pr(pr)
+                if resuming:
+                    logging.info("resuming pr for {} branch".format(branch))
+                self.journal.record(branch, "started")
+
+                if not self.journal.done(branch, "branch") and not (
+                    resuming and self._branch_already_exists(branch)
+                ):
+                    self._create_branch(pr)
+                self.journal.record(branch, "branch")
+
+                if not self.journal.done(branch, "commit") and not (
+                    resuming and self._file_committed(pr)
+                ):
+                    if pr.action == "deprecate":
+                        self._deprecate_file(pr)
+                    else:
+                        self._remove_file(pr)
+                self.journal.record(branch, "commit")
+
+                if not (resuming and self._pr_exists(pr)):
+                    self._create_pr(pr)
+                self.journal.record(branch, "pr")
+                self.handled_branches.add(branch)
                 _prs_created += 1
             except GithubException as err:
                 logging.warning(
                     "failed to create pr for {}:: {}".format(pr.filepath, str(err))
                 )
         logging.info("created {} pull requests".format(_prs_created))
+        return _prs_created
+
+
+def to_epoch(dt: datetime) -> float:
+    """
+    converts a naive datetime to seconds since epoch, treating it as UTC like
+    all datetimes parsed from the github api.
+    """
+    return calendar.timegm(dt.timetuple()) + dt.microsecond / 1e6
+
+
+@dataclass
+class PolicyPlan:
+    """
+    the result of the batch policy evaluation. Candidates are (index, action)
+    pairs sorted by staleness, the longest overdue stack comes first.
+    """
+
+    deprecate_mask: list[bool]
+    remove_mask: list[bool]
+    candidates: list[tuple[int, Literal["deprecate", "remove"]]]
+
+
+def evaluate_policy(
+    last_modified_epochs: Sequence[float],
+    deprecated: Sequence[bool],
+    now_epoch: float,
+    deprecation_days_limit: int = DEPRECATION_DAYS_LIMIT,
+    removal_days_limit: int = REMOVAL_DAYS_LIMIT,
+) -> PolicyPlan:
+    """
+    computes the deprecate and remove masks for all stacks in one pass, using
+    a single "now" snapshot.
+    """
+    dues = [
+        epoch + (removal_days_limit if dep else deprecation_days_limit) * 86400
+        for epoch, dep in zip(last_modified_epochs, deprecated)
+    ]
+    deprecate_mask = [now_epoch > due and not dep for due, dep in zip(dues, deprecated)]
+    remove_mask = [now_epoch > due and dep for due, dep in zip(dues, deprecated)]
+    return PolicyPlan(
+        deprecate_mask=deprecate_mask,
+        remove_mask=remove_mask,
+        candidates=[
+            (i, "remove" if remove_mask[i] else "deprecate")
+            for i in sorted(
+                (i for i, due in enumerate(dues) if now_epoch > due),
+                key=lambda i: dues[i],
+            )
+        ],
+    )
 
 
 class RegistryStackMaintainer:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        deprecation_days_limit: int = DEPRECATION_DAYS_LIMIT,
+        removal_days_limit: int = REMOVAL_DAYS_LIMIT,
+    ) -> None:
+        self.deprecation_days_limit = deprecation_days_limit
+        self.removal_days_limit = removal_days_limit
         self.yaml = get_YAML()
+        self.composer_yaml = get_composer_YAML()
+
+    def update_all(
+        self, stacks: Sequence[RegistryStack | CompactRegistryStack]
+    ) -> list[RegistryRepoPR]:
+        """
+        checks all given stacks against the removal and deprecation criteria at
+        once. The PRs returned are sorted by staleness, so the longest overdue
+        stacks are prioritized under the PR creation limit.
+        """
+        plan = evaluate_policy(
+            [
+                (
+                    s.last_modified_epoch
+                    if isinstance(s, CompactRegistryStack)
+                    else to_epoch(s.last_modified)
+                )
+                for s in stacks
+            ],
+            [s.deprecated for s in stacks],
+            now_epoch=to_epoch(get_now()),
+            deprecation_days_limit=self.deprecation_days_limit,
+            removal_days_limit=self.removal_days_limit,
+        )
+        prs: list[RegistryRepoPR] = []
+        for i, action in plan.candidates:
+            stack = stacks[i]
+            if action == "deprecate":
+                logging.info(
+                    "Stack {} should be deprecated. Last modified {}".format(
+                        stack.name, stack.last_modified
+                    )
+                )
+                prs.append(self._deprecate(stack))
+            else:
+                logging.info(
+                    "Stack {} is deprecated and should be removed. Last modified {}".format(  # noqa: E501
+                        stack.name, stack.last_modified
+                    )
+                )
+                prs.append(self._remove(stack))
+        logging.debug("{} stacks don't need any update".format(len(stacks) - len(prs)))
+        return prs
 
-    def update(self, stack: RegistryStack) -> RegistryRepoPR | None:
+    def update(
+        self, stack: RegistryStack | CompactRegistryStack
+    ) -> RegistryRepoPR | None:
         """
         checks if the given stack matches the removal or deprecation
         citeria.
         """
         if not stack.deprecated and self._limit_reached(
-            stack.last_modified, DEPRECATION_DAYS_LIMIT
+            stack.last_modified, self.deprecation_days_limit
         ):
             logging.info(
                 "Stack {} should be deprecated. Last modified {}".format(
@@ -394,7 +1904,7 @@ class RegistryStackMaintainer:
             return self._deprecate(stack)
 
         elif stack.deprecated and self._limit_reached(
-            stack.last_modified, REMOVAL_DAYS_LIMIT
+            stack.last_modified, self.removal_days_limit
         ):
             logging.info(
                 "Stack {} is deprecated and should be removed. Last modified {}".format(
@@ -412,7 +1922,7 @@ class RegistryStackMaintainer:
             return None
 
     def _limit_reached(self, last_modified: datetime, days_limit: int) -> bool:
-        return datetime.now() > last_modified + timedelta(days=days_limit)
+        return get_now() > last_modified + timedelta(days=days_limit)
 
     def _add_owners_mention(self, desc_list: list[str], owners: list[str]) -> list[str]:
         """
@@ -426,22 +1936,120 @@ class RegistryStackMaintainer:
             )
         return desc_list
 
-    def _deprecate(self, stack: RegistryStack) -> RegistryRepoPR:
+    def _get_node_value(self, node: Any, key: str) -> Any:
+        """
+        returns the value node of the key inside a mapping node, if any.
+        """
+        from ruamel.yaml.nodes import MappingNode
+
+        if not isinstance(node, MappingNode):
+            return None
+        for key_node, value_node in node.value:
+            if key_node.value == key:
+                # an alias points to a node found elsewhere in the text
+                if value_node.start_mark.index < key_node.end_mark.index:
+                    return None
+                return value_node
+        return None
+
+    def _patch_tag(self, content: str, tag: str) -> str | None:
+        """
+        adds the tag to metadata.tags as a minimal text edit, so the rest of
+        the devfile is kept as is. The patched devfile is parsed again and has
+        to equal the original one plus the tag. Returns None if the layout of
+        the tags can't be patched safely.
+        """
+        from ruamel.yaml import YAMLError
+
+        # the parser marks index the stream after the byte order mark
+        body = content.removeprefix("\ufeff")
+        bom = "\ufeff" if body != content else ""
+        try:
+            patched = self._insert_tag(body, tag)
+            if patched is None:
+                return None
+            want = self.composer_yaml.load(content)
+            want["metadata"]["tags"].append(tag)
+            if self.composer_yaml.load(patched) != want:
+                return None
+        except (YAMLError, KeyError, TypeError, AttributeError):
+            return None
+        return bom + patched
+
+    def _insert_tag(self, content: str, tag: str) -> str | None:
+        """
+        inserts the tag in the text of metadata.tags, placed using the parser
+        marks of the tags node.
+        """
+        from ruamel.yaml.nodes import ScalarNode, SequenceNode
+
+        tags = self._get_node_value(
+            self._get_node_value(self.composer_yaml.compose(content), "metadata"),
+            "tags",
+        )
+        if not isinstance(tags, SequenceNode) or not all(
+            isinstance(t, ScalarNode) and t.start_mark.line == t.end_mark.line
+            for t in tags.value
+        ):
+            return None
+
+        last = tags.value[-1] if len(tags.value) > 0 else None
+        quote = last.style if last is not None and last.style in ("'", '"') else ""
+        item = "{0}{1}{0}".format(quote, tag)
+        if tags.flow_style:
+            # a single line [a, b] list, the new tag goes before the bracket
+            close = tags.end_mark.index - 1
+            after_items = (
+                tags.start_mark.index + 1 if last is None else last.end_mark.index
+            )
+            if (
+                tags.start_mark.line != tags.end_mark.line
+                or content[close] != "]"
+                or content[after_items:close].strip() != ""
+            ):
+                return None
+            separator = "" if last is None else ", "
+            return content[:after_items] + separator + item + content[after_items:]
+
+        if last is None:
+            return None
+        # a block list, the new tag goes in a line after the last one, using
+        # the same indentation and dash
+        item_start = last.start_mark.index
+        line_start = content.rfind("\n", 0, item_start) + 1
+        dash = content[line_start:item_start]
+        if dash.strip() != "-":
+            return None
+        line_end = content.find("\n", last.end_mark.index)
+        line_end = len(content) if line_end == -1 else line_end
+        newline = "\n"
+        if line_end > 0 and content[line_end - 1] == "\r":
+            line_end -= 1
+            newline = "\r\n"
+        return content[:line_end] + newline + dash + item + content[line_end:]
+
+    def _dump_tag(self, content: str, tag: str) -> str:
         """
-        updates the stack content with the deprecated tag.
+        adds the tag to metadata.tags through a round-trip load and dump of the
+        whole devfile.
         """
-        # add deprecated stack
-        devfile_dict = self.yaml.load(stack.devfile_content)
-        devfile_dict["metadata"]["tags"].append(DEPRECATED_TAG)
+        devfile_dict = self.yaml.load(content)
+        devfile_dict["metadata"]["tags"].append(tag)
 
         # dump new content to variable
         _buf = io.StringIO()
         _ = self.yaml.dump(devfile_dict, _buf)
-        devfile_updated_content = _buf.getvalue()
+        return _buf.getvalue()
+
+    def _deprecate(self, stack: RegistryStack | CompactRegistryStack) -> RegistryRepoPR:
+        """
+        updates the stack content with the deprecated tag. The content of
+        compact stacks is only fetched and updated when the PR gets created.
+        """
         desc_list = [
             "## What this PR does?\n",
             "This PR deprecates the {} stack as it has reached the inactivity limit of {} days.".format(  # noqa: E501
-                stack.name, DEPRECATION_DAYS_LIMIT
+                stack.name, self.deprecation_days_limit
             ),
         ]
 
@@ -449,11 +2057,20 @@ class RegistryStackMaintainer:
 
         return RegistryRepoPR(
             title="chore: Deprecate {} stack after {} days of inactivity".format(
-                stack.name, DEPRECATION_DAYS_LIMIT
+                stack.name, self.deprecation_days_limit
             ),
             description="\n".join(desc_list),
             commit_message="Deprecate {}".format(stack.name),
-            devfile_updated_content=devfile_updated_content,
+            devfile_updated_content=(
+                None
+                if isinstance(stack, CompactRegistryStack)
+                else self._get_deprecated_content(stack)
+            ),
+            content_builder=(
+                (lambda: self._get_deprecated_content(stack))
+                if isinstance(stack, CompactRegistryStack)
+                else None
+            ),
             branch_name="devfile_maintainer/deprecate-{}".format(
                 stack.name.replace("/", "-")
             ),
@@ -462,14 +2079,31 @@ class RegistryStackMaintainer:
             filepath=stack.devfile_path,
         )
 
-    def _remove(self, stack: RegistryStack) -> RegistryRepoPR:
+    def _get_deprecated_content(
+        self, stack: RegistryStack | CompactRegistryStack
+    ) -> str:
+        """
+        gets the stack content with the deprecated tag added.
+        """
+        devfile_content = stack.devfile_content
+        devfile_updated_content = self._patch_tag(devfile_content, DEPRECATED_TAG)
+        if devfile_updated_content is None:
+            logging.debug(
+                "Tags of {} can't be patched, dumping the whole devfile".format(
+                    stack.name
+                )
+            )
+            devfile_updated_content = self._dump_tag(devfile_content, DEPRECATED_TAG)
+        return devfile_updated_content
+
+    def _remove(self, stack: RegistryStack | CompactRegistryStack) -> RegistryRepoPR:
         """
         creates a RegistryRepoPR object for the removal action.
         """
         desc_list = [
             "## What this PR does?\n",
             "This PR deprecates the {} stack as it has reached the inactivity limit of {} days.".format(  # noqa: E501
-                stack.name, DEPRECATION_DAYS_LIMIT
+                stack.name, self.deprecation_days_limit
             ),
         ]
 
@@ -477,7 +2111,7 @@ class RegistryStackMaintainer:
 
         return RegistryRepoPR(
             title="chore: Remove {} stack after {} days of inactivity".format(
-                stack.name, DEPRECATION_DAYS_LIMIT
+                stack.name, self.deprecation_days_limit
             ),
             description="\n".join(desc_list),
             action="remove",
@@ -490,24 +2124,610 @@ class RegistryStackMaintainer:
         )
 
 
-def main():
-    provider = GithubProvider()
-    maintainer = RegistryStackMaintainer()
-    prs: list[RegistryRepoPR] = []
+class RegistryDaemon:
+    """
+    keeps the stacks of the registry in memory and updates them from the push
+    events received through its HTTP endpoint. Only the devfiles changed by a
+    push are fetched again, and the maintainer runs on the updated stacks
+    every interval. A full scan runs every rescan_interval, picking up the
+    OWNERS changes and any missed event.
+    """
 
-    try:
-        stacks = provider.get_stacks()
-    except CriticalException as err:
-        critical_error(str(err))
+    def __init__(
+        self,
+        provider: GithubProvider,
+        interval: int = DAEMON_INTERVAL,
+        rescan_interval: int = DAEMON_RESCAN_INTERVAL,
+        secret: str = WEBHOOK_SECRET,
+    ) -> None:
+        import threading
+
+        self.provider = provider
+        self.interval = interval
+        self.rescan_interval = rescan_interval
+        self.secret = secret
+        self.stacks: dict[str, RegistryStack] = {}
+        # devfile paths changed by pushes -> last modified date
+        self.changed: dict[str, datetime] = {}
+        self.rescan_needed = True
+        self.last_scan = 0.0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self._threads: list[Thread] = []
+        self._server: Any = None
+
+    def scan(self) -> None:
+        """
+        loads all stacks of the registry. The errors and the PRs handled so far
+        are reset, so the scan checks every stack again.
+        """
+        errors = self.provider.stack_errors
+        self.provider.stack_errors = {}
+        try:
+            stacks = {s.devfile_path: s for s in self.provider.get_stacks()}
+        except Exception:
+            self.provider.stack_errors = errors
+            raise
+        with self.lock:
+            self.stacks = stacks
+            self.rescan_needed = False
+            self.last_scan = time.monotonic()
+            self.provider.handled_branches = set()
+        logging.info(
+            "Loaded {} stacks, {} having errors".format(
+                len(stacks), len(self.provider.stack_errors)
+            )
+        )
+
+    def verify_signature(self, body: bytes, signature: str | None) -> bool:
+        import hashlib
+        import hmac
+
+        if self.secret == "":
+            return True
+
+        digest = hmac.new(self.secret.encode(), body, hashlib.sha256).hexdigest()
+        return signature is not None and hmac.compare_digest(
+            "sha256={}".format(digest), signature
+        )
+
+    def handle_push(self, payload: dict[str, Any]) -> int:
+        """
+        records the devfiles changed by a push event on the default branch and
+        returns their number. Removed devfiles are dropped right away.
+        """
+        if payload.get("ref") != "refs/heads/{}".format(self.provider.default_branch):
+            return 0
+
+        commits = payload.get("commits", [])
+        stacks_prefix = self.provider.stacks_dir + "/"
+        changed: set[str] = set()
+        with self.lock:
+            # the payload lists 20 commits at most and forced pushes may drop
+            # commits, so those need a full scan
+            if payload.get("forced") or len(commits) >= 20:
+                self.rescan_needed = True
+            for commit in commits:
+                date = (
+                    datetime.fromisoformat(commit["timestamp"])
+                    .astimezone(timezone.utc)
+                    .replace(tzinfo=None)
+                )
+                for path in commit.get("added", []) + commit.get("modified", []):
+                    if path.startswith(stacks_prefix) and is_devfile(path):
+                        self.changed[path] = max(date, self.changed.get(path, date))
+                        changed.add(path)
+                for path in commit.get("removed", []):
+                    if path.startswith(stacks_prefix) and is_devfile(path):
+                        self.stacks.pop(path, None)
+                        self.changed.pop(path, None)
+                        changed.add(path)
+        return len(changed)
+
+    def tick(self) -> list[RegistryRepoPR]:
+        """
+        fetches the changed stacks (or all of them when a full scan is due),
+        then creates the PRs the stacks need. A stack failing to be fetched
+        again is retried by the next tick, while one failing to be parsed is
+        dropped and kept in the provider stack_errors. The PRs created or found
+        opened by earlier ticks are left out until the next full scan, so only
+        the stacks which just became due are checked against the repo.
+        """
+        from github.GithubException import GithubException
+
+        if (
+            self.rescan_needed
+            or time.monotonic() - self.last_scan >= self.rescan_interval
+        ):
+            self.scan()
+
+        with self.lock:
+            changed, self.changed = self.changed, {}
+        updated = 0
+        for path, date in changed.items():
+            current = self.stacks.get(path)
+            try:
+                stack = self.provider.get_stack(
+                    path,
+                    date.strftime(DATETIME_STRFTIME_FORMAT),
+                    owners=None if current is None else current.owners,
+                )
+            except GithubException as err:
+                if err.status != 404:
+                    logging.warning(
+                        "Fetching stack {} failed, retrying:: {}".format(path, str(err))
+                    )
+                    with self.lock:
+                        self.changed[path] = max(date, self.changed.get(path, date))
+                    continue
+                error = "{}: {}".format(type(err).__name__, err)
+            except Exception as err:
+                error = "{}: {}".format(type(err).__name__, err)
+            else:
+                with self.lock:
+                    self.stacks[path] = stack
+                    self.provider.stack_errors.pop(path, None)
+                updated += 1
+                continue
+
+            logging.error("Skipping stack {}:: {}".format(path, error))
+            with self.lock:
+                self.stacks.pop(path, None)
+                self.provider.stack_errors[path] = [error]
+        if updated > 0:
+            logging.info("Updated {} changed stacks".format(updated))
+
+        with self.lock:
+            stacks = list(self.stacks.values())
+        prs = [
+            pr
+            for pr in get_maintainer(self.provider).update_all(stacks)
+            if pr.branch_name not in self.provider.handled_branches
+        ]
+        self.provider.create_prs(prs)
+        return prs
 
+    def _run_timer(self) -> None:
+        # any failure is left to the next tick, so the timer keeps running
+        while not self.stopped.wait(self.interval):
+            try:
+                self.tick()
+            except Exception as err:
+                logging.error("Daemon tick failed:: {}".format(str(err)))
+
+    def _handler_class(self) -> type:
+        from http.server import BaseHTTPRequestHandler
+
+        daemon = self
+
+        class WebhookHandler(BaseHTTPRequestHandler):
+            def _reply(self, status: int, data: dict[str, Any]) -> None:
+                body = json.dumps(data).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                with daemon.lock:
+                    stats = {
+                        "stacks": len(daemon.stacks),
+                        "changed": len(daemon.changed),
+                        "errors": len(daemon.provider.stack_errors),
+                    }
+                self._reply(200, stats)
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not daemon.verify_signature(
+                    body, self.headers.get("X-Hub-Signature-256")
+                ):
+                    return self._reply(401, {"message": "Bad signature"})
+
+                event = self.headers.get("X-GitHub-Event", "")
+                if event != "push":
+                    return self._reply(
+                        200, {"message": "Ignored {} event".format(event)}
+                    )
+                try:
+                    changed = daemon.handle_push(json.loads(body))
+                except (ValueError, KeyError, TypeError) as err:
+                    return self._reply(400, {"message": str(err)})
+                self._reply(202, {"changed": changed})
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logging.debug(format % args)
+
+        return WebhookHandler
+
+    def start(self, host: str = DAEMON_HOST, port: int = DAEMON_PORT) -> None:
+        """
+        starts the HTTP endpoint and the timer, each in a thread.
+        """
+        import threading
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._server.serve_forever, daemon=True),
+            threading.Thread(target=self._run_timer, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logging.info(
+            "Listening for push events on {}:{}".format(*self._server.server_address)
+        )
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+
+
+def get_maintainer(provider: GithubProvider) -> RegistryStackMaintainer:
+    return RegistryStackMaintainer(
+        deprecation_days_limit=provider.deprecation_days_limit,
+        removal_days_limit=provider.removal_days_limit,
+    )
+
+
+def get_stacks(
+    provider: GithubProvider,
+) -> list[RegistryStack] | list[CompactRegistryStack]:
+    if COMPACT_STACKS > 0:
+        return provider.get_compact_stacks()
+    return provider.get_stacks()
+
+
+def get_planned_prs(provider: GithubProvider) -> list[RegistryRepoPR]:
+    """
+    fetches all stacks of the registry and returns the PRs they need.
+    """
+    stacks = get_stacks(provider)
     logging.info("Fetched {} stacks from repo".format(len(stacks)))
-    for stack in stacks:
-        pr = maintainer.update(stack)
-        if pr is not None:
-            prs.append(pr)
+    return get_maintainer(provider).update_all(stacks)
+
+
+def get_provider(daemon: bool = False) -> GithubProvider:
+    """
+    builds the provider of the run from the inputs. The daemon provider reads
+    every stack, with no scan budget nor expiry index, as the daemon keeps all
+    stacks in memory, and skips the broken stacks so a scan doesn't fail.
+    """
+    return GithubProvider(
+        token=GITHUB_TOKEN,
+        registry_url=REGISTRY_REPO,
+        base_url=GITHUB_API_URL,
+        stacks_source=STACKS_SOURCE,
+        local_mirror=LOCAL_MIRROR,
+        parse_workers=PARSE_WORKERS,
+        journal_path=JOURNAL_PATH,
+        scan_budget=(
+            None
+            if daemon
+            else ScanBudget(
+                seconds=SCAN_BUDGET_SECONDS,
+                calls=SCAN_BUDGET_CALLS,
+                coverage_runs=SCAN_COVERAGE_RUNS,
+            )
+        ),
+        scan_cursor_path=SCAN_CURSOR_PATH,
+        expiry_index_path="" if daemon else EXPIRY_INDEX_PATH,
+        devfile_schema_path=DEVFILE_SCHEMA_PATH if VALIDATE_SCHEMA > 0 else "",
+        skip_broken_stacks=daemon,
+    )
 
-    logging.info("{} PRs should be created".format(len(prs)))
-    provider.create_prs(prs)
+
+def get_registry_path(path: str, repo: str) -> str:
+    """
+    returns the state file path of a registry in a multi-registry run, e.g.
+    drm_journal.jsonl becomes drm_journal.devfile-registry.jsonl for the
+    devfile/registry repo. An empty path stays empty.
+    """
+    if path == "":
+        return path
+
+    root, ext = os.path.splitext(path)
+    return "{}.{}{}".format(root, repo.replace("/", "-"), ext)
+
+
+@dataclass
+class RegistrySettings:
+    """
+    the settings of a registry repo maintained in a multi-registry run. The
+    ones not given fall back to the single registry inputs.
+    """
+
+    repo: str
+    stacks_dir: str = STACKS_DIR
+    default_branch: str = DEFAULT_BRANCH
+    deprecation_days_limit: int = DEPRECATION_DAYS_LIMIT
+    removal_days_limit: int = REMOVAL_DAYS_LIMIT
+    pr_creation_limit: int = PR_CREATION_LIMIT
+    local_mirror: str = ""
+
+    def get_provider(self, gb: Github, scan_budget: ScanBudget) -> GithubProvider:
+        return GithubProvider(
+            registry_url=self.repo,
+            base_url=GITHUB_API_URL,
+            stacks_source=STACKS_SOURCE,
+            local_mirror=self.local_mirror,
+            parse_workers=PARSE_WORKERS,
+            journal_path=get_registry_path(JOURNAL_PATH, self.repo),
+            scan_budget=scan_budget,
+            scan_cursor_path=get_registry_path(SCAN_CURSOR_PATH, self.repo),
+            expiry_index_path=get_registry_path(EXPIRY_INDEX_PATH, self.repo),
+            stacks_dir=self.stacks_dir,
+            default_branch=self.default_branch,
+            deprecation_days_limit=self.deprecation_days_limit,
+            removal_days_limit=self.removal_days_limit,
+            pr_creation_limit=self.pr_creation_limit,
+            gb=gb,
+            devfile_schema_path=DEVFILE_SCHEMA_PATH if VALIDATE_SCHEMA > 0 else "",
+        )
+
+
+def load_registries(value: str = REGISTRIES) -> list[RegistrySettings]:
+    """
+    reads the registries input, a yaml (or json) list given inline or as a
+    file path. Each item is a repo name or a mapping of RegistrySettings.
+    """
+    from ruamel.yaml import YAML, YAMLError
+
+    if os.path.isfile(value):
+        with open(value) as f:
+            value = f.read()
+    try:
+        entries = YAML(typ="safe", pure=True).load(value)
+    except YAMLError as err:
+        raise CriticalException("invalid registries given:: {}".format(str(err)))
+    if not isinstance(entries, list):
+        raise CriticalException("registries should be a list of repos")
+
+    names = {f.name for f in fields(RegistrySettings)}
+    registries: list[RegistrySettings] = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"repo": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("repo"), str):
+            raise CriticalException("registry without repo given:: {}".format(entry))
+        for key, setting in entry.items():
+            if key not in names:
+                raise CriticalException(
+                    "unknown setting {} given for {}".format(key, entry["repo"])
+                )
+            default = getattr(RegistrySettings, key, "")
+            if type(setting) is not type(default):
+                raise CriticalException(
+                    "invalid {} given for {}:: {}".format(key, entry["repo"], setting)
+                )
+        registries.append(RegistrySettings(**entry))
+
+    repos = Counter(r.repo for r in registries)
+    if len(repos) != len(registries):
+        raise CriticalException(
+            "registries given more than once:: {}".format(
+                ", ".join(repo for repo, count in repos.items() if count > 1)
+            )
+        )
+    return registries
+
+
+@dataclass
+class RegistryReport:
+    """
+    the outcome of maintaining a registry repo, as listed in the run report.
+    """
+
+    repo: str
+    stacks: int = 0
+    prs: list[RegistryRepoPR] = field(default_factory=list)
+    created: int = 0
+    error: str | None = None
+    seconds: float = 0.0
+    # devfile path -> parse or schema errors
+    stack_errors: dict[str, list[str]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "repo": self.repo,
+            "stacks": self.stacks,
+            "prs": [
+                {"action": pr.action, "filepath": pr.filepath, "branch": pr.branch_name}
+                for pr in self.prs
+            ],
+            "created": self.created,
+            "error": self.error,
+            "seconds": round(self.seconds, 3),
+            "stack_errors": self.stack_errors,
+        }
+
+
+def update_registry(
+    provider: GithubProvider, report: RegistryReport, create: bool = True
+) -> None:
+    """
+    checks all stacks of the provider registry and creates the PRs they
+    need, unless create is False, filling in the report.
+    """
+    stacks = get_stacks(provider)
+    report.stacks = len(stacks)
+    logging.info("Fetched {} stacks from {}".format(len(stacks), report.repo))
+    report.prs = get_maintainer(provider).update_all(stacks)
+    report.stack_errors = provider.stack_errors
+    if create:
+        logging.info("{} PRs should be created".format(len(report.prs)))
+        report.created = provider.create_prs(report.prs)
+        provider.save_scan_cursor(report.prs)
+
+
+def maintain_registry(
+    settings: RegistrySettings,
+    scan_budget: ScanBudget,
+    create: bool = True,
+) -> RegistryReport:
+    """
+    checks all stacks of a registry and creates the PRs they need, unless
+    create is False. A failure is kept in the report, so it doesn't stop the
+    other registries of the run. The registry gets its own github client, as
+    a client can't be shared by threads.
+    """
+    from github.GithubException import GithubException
+
+    report = RegistryReport(repo=settings.repo)
+    started = time.monotonic()
+    try:
+        gb = get_github_client(GITHUB_TOKEN, GITHUB_API_URL)
+        update_registry(settings.get_provider(gb, scan_budget), report, create)
+    except (CriticalException, GithubException) as err:
+        logging.error("Maintaining {} failed:: {}".format(settings.repo, str(err)))
+        report.error = str(err)
+    except Exception as err:
+        # e.g. a devfile without metadata.tags, which shouldn't stop the run
+        report.error = "{}: {}".format(type(err).__name__, err)
+        logging.error("Maintaining {} failed:: {}".format(settings.repo, report.error))
+    report.seconds = time.monotonic() - started
+    return report
+
+
+def maintain_registries(
+    registries: list[RegistrySettings],
+    create: bool = True,
+    workers: int = REGISTRY_WORKERS,
+) -> list[RegistryReport]:
+    """
+    maintains the registries concurrently, each over its own github client.
+    They share the rate limit of the token, which the scan budget counts the
+    calls from, and the scan budget itself. Reports keep the given order.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    scan_budget = ScanBudget(
+        seconds=SCAN_BUDGET_SECONDS,
+        calls=SCAN_BUDGET_CALLS,
+        coverage_runs=SCAN_COVERAGE_RUNS,
+    )
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(registries)))) as pool:
+        return list(
+            pool.map(lambda r: maintain_registry(r, scan_budget, create), registries)
+        )
+
+
+def report_registries(
+    reports: list[RegistryReport], report_path: str = REPORT_PATH
+) -> None:
+    """
+    logs the consolidated report of a run and writes it as json to the
+    report_path, if given. Raises if any registry failed.
+    """
+    for report in reports:
+        logging.info(
+            "{}: {} stacks, {} with errors, {} PRs planned, {} created in {:.1f}s{}".format(  # noqa: E501
+                report.repo,
+                report.stacks,
+                len(report.stack_errors),
+                len(report.prs),
+                report.created,
+                report.seconds,
+                "" if report.error is None else ", failed",
+            )
+        )
+    if report_path != "":
+        tmp_path = report_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"registries": [r.to_dict() for r in reports]}, f, indent=2)
+        os.replace(tmp_path, report_path)
+
+    failed = [r.repo for r in reports if r.error is not None]
+    if len(failed) > 0:
+        raise CriticalException(
+            "{} of {} registries failed:: {}".format(
+                len(failed), len(reports), ", ".join(failed)
+            )
+        )
+
+
+def run():
+    if REGISTRIES != "":
+        report_registries(maintain_registries(load_registries(REGISTRIES)), REPORT_PATH)
+        return
+
+    report = RegistryReport(repo=REGISTRY_REPO)
+    started = time.monotonic()
+    update_registry(get_provider(), report)
+    report.seconds = time.monotonic() - started
+    report_registries([report], REPORT_PATH)
+
+
+def plan() -> None:
+    """
+    prints the PRs the run would create, without touching the registry repo.
+    """
+    if REGISTRIES != "":
+        reports = maintain_registries(load_registries(REGISTRIES), create=False)
+        for report in reports:
+            for pr in report.prs:
+                print(
+                    "{}\t{}\t{}\t{}".format(
+                        report.repo, pr.action, pr.filepath, pr.branch_name
+                    )
+                )
+        report_registries(reports, REPORT_PATH)
+        return
+
+    provider = get_provider()
+    prs = get_planned_prs(provider)
+    for pr in prs:
+        print("{}\t{}\t{}".format(pr.action, pr.filepath, pr.branch_name))
+    logging.info("{} PRs would be created".format(len(prs)))
+
+
+def serve() -> None:
+    """
+    runs the maintainer as a daemon, updating the stacks from push events.
+    """
+    daemon = RegistryDaemon(get_provider(daemon=True))
+    daemon.scan()
+    daemon.start()
+    try:
+        daemon.stopped.wait()
+    except KeyboardInterrupt:
+        logging.info("Stopping daemon")
+    finally:
+        daemon.stop()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="maintainer.py",
+        description="deprecates and removes inactive devfile registry stacks. "
+        "All settings are read from the INPUT_* env vars listed in the README.md.",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("run", help="checks all stacks and creates the PRs")
+    subparsers.add_parser(
+        "plan", help="prints the PRs that would be created, without creating them"
+    )
+    subparsers.add_parser(
+        "serve", help="runs as a daemon, updating the stacks from push events"
+    )
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = get_parser().parse_args(argv)
+    check_inputs()
+    command = {"plan": plan, "serve": serve}.get(args.command, run)
+    try:
+        with use_cassette(CASSETTE_MODE, CASSETTE_PATH):
+            command()
+    except CriticalException as err:
+        critical_error(str(err))
 
 
 if __name__ == "__main__":
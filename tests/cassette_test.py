@@ -0,0 +1,188 @@
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+from maintainer import (
+    Cassette,
+    CriticalException,
+    GithubProvider,
+    RegistryStackMaintainer,
+    get_github_client,
+    get_now,
+    use_cassette,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+from tests.utils import MaintainerTestCase, run_test_cases
+
+
+def _plan(base_url: str, repo: str) -> list:
+    provider = GithubProvider(token="test-token", registry_url=repo, base_url=base_url)
+    _maintainer = RegistryStackMaintainer()
+    stacks = provider.get_stacks()
+    return [(s.name, s.file_sha, _maintainer.update(s)) for s in stacks]
+
+
+def test_record_and_replay(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "cassette.jsonl.gz")
+    registry = generate_registry(10, seed=3)
+    with FakeGithubServer(registry) as server:
+        with use_cassette("record", path) as cassette:
+            recorded = _plan(server.base_url, server.state.repo)
+        requests = len(server.requests)
+        base_url, repo = server.base_url, server.state.repo
+
+    # the server is gone, so everything below comes from the cassette
+    with use_cassette("replay", path) as replayed_cassette:
+        replayed = _plan(base_url, repo)
+
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="replay returns the recorded results",
+                args=None,
+                want=recorded,
+                func=lambda: replayed,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="all requests are recorded",
+                args=None,
+                want=requests,
+                func=lambda: len(cassette.interactions),  # type: ignore
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="call counts are the same on replay",
+                args=None,
+                want=cassette.call_counts(),  # type: ignore
+                func=replayed_cassette.call_counts,  # type: ignore
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="commits are fetched once per devfile",
+                args=None,
+                want=len(registry.devfile_paths),
+                func=lambda: cassette.call_counts()[  # type: ignore
+                    "GET /repos/{}/commits".format(repo)
+                ],
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_replay_missing_interaction(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "cassette.jsonl.gz")
+    Cassette(path).save()
+    with use_cassette("replay", path):
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="request not found in cassette",
+                    args=("test-token", "fake/registry", "http://127.0.0.1:1"),
+                    func=GithubProvider,
+                    want_error=CriticalException,  # type: ignore
+                ),
+            ]
+        )
+
+
+def test_load_missing_cassette(tmp_path: str) -> None:
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="cassette file does not exist",
+                args=(os.path.join(tmp_path, "missing.jsonl.gz"),),
+                func=Cassette.load,
+                want_error=CriticalException,  # type: ignore
+            ),
+        ]
+    )
+
+
+def test_replay_archive_source(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "cassette.jsonl.gz")
+    registry = generate_registry(5, seed=3)
+    with FakeGithubServer(registry) as server:
+        with use_cassette("record", path):
+            provider = GithubProvider(
+                token="test-token",
+                registry_url=server.state.repo,
+                base_url=server.base_url,
+                stacks_source="archive",
+            )
+            stacks = provider.get_stacks()
+        base_url, repo = server.base_url, server.state.repo
+
+    with use_cassette("replay", path):
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=repo,
+            base_url=base_url,
+            stacks_source="archive",
+        )
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="the recorded run downloaded the archive",
+                    args=None,
+                    want=len(registry.devfile_paths),
+                    func=lambda: len(stacks),
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="the archive download can't be replayed",
+                    args=None,
+                    want=None,
+                    func=provider.get_stacks,
+                    want_error=CriticalException,  # type: ignore
+                ),
+            ]
+        )
+
+
+def test_replay_recorded_time(tmp_path: str) -> None:
+    path = os.path.join(tmp_path, "cassette.jsonl.gz")
+    cassette = Cassette(path)
+    cassette.now = datetime(2021, 1, 1, 12, 30)
+    cassette.save()
+    _maintainer = RegistryStackMaintainer(deprecation_days_limit=60)
+    with use_cassette("replay", path), patch("maintainer.TEST_MODE", 0):
+        gb = get_github_client(token="")
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="the recorded time is used on replay",
+                    args=None,
+                    want=datetime(2021, 1, 1, 12, 30),
+                    func=get_now,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="stacks are planned at the recorded time",
+                    args=(datetime(2020, 12, 1), 60),
+                    want=False,
+                    func=_maintainer._limit_reached,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="replayed requests are not throttled",
+                    args=None,
+                    want=None,
+                    func=lambda: gb._Github__requester._Requester__seconds_between_requests,  # type: ignore # noqa: E501
+                    want_error=None,
+                ),
+            ]
+        )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the current time is used outside of the cassette",
+                args=(datetime(2020, 12, 1), 60),
+                want=True,
+                func=_maintainer._limit_reached,
+                want_error=None,
+            ),
+        ]
+    )
@@ -0,0 +1,168 @@
+from maintainer import (
+    CompactRegistryStack,
+    GithubProvider,
+    OwnersTable,
+    RegistryRepoPR,
+    RegistryStack,
+    RegistryStackMaintainer,
+)
+from tests.fake_github import FakeGithubServer
+from tests.utils import MaintainerTestCase, run_test_cases
+
+
+def test_owners_table() -> None:
+    table = OwnersTable()
+    ids = table.intern(["maintainer", "reviewer"])
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="known owners get the same ids",
+                args=(["reviewer", "maintainer"],),
+                want=(ids[1], ids[0]),
+                func=table.intern,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="ids resolve back to owners",
+                args=(ids,),
+                want=["maintainer", "reviewer"],
+                func=table.resolve,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_from_registry_stack(
+    test_registry_stack: RegistryStack,
+    test_expired_non_deprecated_registry_stack: RegistryStack,
+    test_deprecated_registry_stack: RegistryStack,
+    registry_stack_maintainer: RegistryStackMaintainer,
+) -> None:
+    table = OwnersTable()
+    loaded: list[str] = []
+    contents = {}
+    for stack in (
+        test_registry_stack,
+        test_expired_non_deprecated_registry_stack,
+        test_deprecated_registry_stack,
+    ):
+        contents[stack.devfile_path] = stack.devfile_content
+
+    def loader(path: str) -> str:
+        loaded.append(path)
+        return contents[path]
+
+    compact = CompactRegistryStack.from_registry_stack(
+        test_expired_non_deprecated_registry_stack, table, loader
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="fields are kept",
+                args=None,
+                want=(
+                    test_expired_non_deprecated_registry_stack.name,
+                    test_expired_non_deprecated_registry_stack.last_modified,
+                    test_expired_non_deprecated_registry_stack.deprecated,
+                    test_expired_non_deprecated_registry_stack.owners,
+                ),
+                func=lambda: (
+                    compact.name,
+                    compact.last_modified,
+                    compact.deprecated,
+                    compact.owners,
+                ),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="content is not loaded on creation",
+                args=None,
+                want=[],
+                func=lambda: loaded,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="no __dict__ is allocated",
+                args=(compact, "__dict__"),
+                want=False,
+                func=hasattr,
+                want_error=None,
+            ),
+        ]
+    )
+
+    def update(stack: CompactRegistryStack) -> RegistryRepoPR | None:
+        pr = registry_stack_maintainer.update(stack)
+        if pr is not None:
+            pr.get_devfile_updated_content()
+        return pr
+
+    for stack in (
+        test_registry_stack,
+        test_expired_non_deprecated_registry_stack,
+        test_deprecated_registry_stack,
+    ):
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="compact stack gets the same update for {}".format(stack),
+                    args=(
+                        CompactRegistryStack.from_registry_stack(stack, table, loader),
+                    ),
+                    want=registry_stack_maintainer.update(stack),
+                    func=update,
+                    want_error=None,
+                )
+            ]
+        )
+
+    loaded.clear()
+    pr = registry_stack_maintainer.update(compact)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="content is not loaded on planning",
+                args=None,
+                want=[],
+                func=lambda: loaded,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="content is loaded once the PR needs it",
+                args=None,
+                want=[compact.devfile_path],
+                func=lambda: pr.get_devfile_updated_content() and loaded,  # type: ignore # noqa: E501
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_compact_stacks(
+    fake_github: FakeGithubServer, github_provider: GithubProvider
+) -> None:
+    stacks = github_provider.get_stacks()
+    compact_stacks = github_provider.get_compact_stacks()
+    path = compact_stacks[0].devfile_path
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="same stacks are fetched",
+                args=None,
+                want=[(s.name, s.file_sha, s.last_modified, s.owners) for s in stacks],
+                func=lambda: [
+                    (s.name, s.file_sha, s.last_modified, s.owners)
+                    for s in compact_stacks
+                ],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="devfile content is loaded on demand",
+                args=None,
+                want=fake_github.state.registry.files[path],
+                func=lambda: compact_stacks[0].devfile_content,
+                want_error=None,
+            ),
+        ]
+    )
@@ -0,0 +1,372 @@
+import hashlib
+import hmac
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+from maintainer import (
+    GithubProvider,
+    RegistryDaemon,
+    RegistryStackMaintainer,
+    get_provider,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+from tests.utils import MaintainerTestCase, run_test_cases
+
+SECRET = "webhook-secret"
+MODIFIED_PATH = "stacks/stack-0/1.0.0/devfile.yaml"
+REMOVED_PATH = "stacks/stack-1/1.0.0/devfile.yaml"
+
+
+@pytest.fixture()
+def daemon():
+    registry = generate_registry(20, seed=11)
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            skip_broken_stacks=True,
+        )
+        # the timer is kept out of the way, ticks are run by the tests
+        _daemon = RegistryDaemon(
+            provider, interval=3600, rescan_interval=3600, secret=SECRET
+        )
+        _daemon.scan()
+        _daemon.start("127.0.0.1", 0)
+        _daemon.fake_server = server  # type: ignore
+        yield _daemon
+        _daemon.stop()
+
+
+def recorded_push(days_ago: int = 1) -> dict:
+    """
+    loads the recorded push event, moving its commits to the given days ago.
+    """
+    with open("tests/resources/push_event.json") as f:
+        payload = json.load(f)
+    date = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    for commit in payload["commits"]:
+        commit["timestamp"] = date.isoformat(timespec="seconds")
+    return payload
+
+
+def post(
+    daemon: RegistryDaemon, payload: dict, event: str = "push", secret: str = SECRET
+) -> tuple[int, dict]:
+    body = json.dumps(payload).encode()
+    signature = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    request = urllib.request.Request(
+        "http://{}:{}/".format(*daemon._server.server_address),
+        data=body,
+        headers={"X-GitHub-Event": event, "X-Hub-Signature-256": signature},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as err:
+        return err.code, json.loads(err.read())
+
+
+def test_webhook_endpoint(daemon: RegistryDaemon) -> None:
+    other_branch = dict(recorded_push(), ref="refs/heads/feature")
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="bad signature is rejected",
+                args=(daemon, recorded_push()),
+                want=(401, {"message": "Bad signature"}),
+                func=lambda d, p: post(d, p, secret="wrong"),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="ping event is ignored",
+                args=(daemon, {"zen": "Keep it logically awesome."}, "ping"),
+                want=(200, {"message": "Ignored ping event"}),
+                func=post,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="push on another branch changes nothing",
+                args=(daemon, other_branch),
+                want=(202, {"changed": 0}),
+                func=post,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="push changes the modified and removed devfiles",
+                args=(daemon, recorded_push()),
+                want=(202, {"changed": 2}),
+                func=post,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="changed stacks wait for the next tick",
+                args=None,
+                want=[MODIFIED_PATH],
+                func=lambda: list(daemon.changed),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_tick_updates_pushed_stacks(daemon: RegistryDaemon) -> None:
+    server: FakeGithubServer = daemon.fake_server  # type: ignore
+    old_stack = daemon.stacks[MODIFIED_PATH]
+    server.state.branches["main"].files[MODIFIED_PATH] += "# bumped\n"
+    payload = recorded_push(days_ago=1)
+    post(daemon, payload)
+
+    server.reset_stats()
+    prs = daemon.tick()
+    stack = daemon.stacks[MODIFIED_PATH]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="last modified comes from the push",
+                args=None,
+                want=datetime.fromisoformat(payload["commits"][0]["timestamp"])
+                .astimezone(timezone.utc)
+                .replace(tzinfo=None),
+                func=lambda: stack.last_modified,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="devfile is fetched again",
+                args=None,
+                want=(True, old_stack.owners),
+                func=lambda: (
+                    stack.devfile_content.endswith("# bumped\n"),
+                    stack.owners,
+                ),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="removed stack is dropped",
+                args=None,
+                want=False,
+                func=lambda: REMOVED_PATH in daemon.stacks,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="only the changed devfile is requested",
+                args=None,
+                want=(1, 0),
+                func=lambda: (
+                    server.count("GET", "/contents/"),
+                    server.count("GET", "/commits"),
+                ),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="prs are planned from the updated stacks",
+                args=None,
+                want=sorted(
+                    pr.branch_name
+                    for pr in RegistryStackMaintainer().update_all(
+                        list(daemon.stacks.values())
+                    )
+                ),
+                func=lambda: sorted(pr.branch_name for pr in prs),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="pushed stack is not deprecated anymore",
+                args=None,
+                want=False,
+                func=lambda: any(pr.filepath == MODIFIED_PATH for pr in prs),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_forced_push_rescans(daemon: RegistryDaemon) -> None:
+    server: FakeGithubServer = daemon.fake_server  # type: ignore
+    post(daemon, dict(recorded_push(), forced=True))
+    server.reset_stats()
+    daemon.tick()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="forced push leads to a full scan",
+                args=None,
+                want=True,
+                func=lambda: server.count("GET", "/commits") > 0,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_tick_skips_broken_stacks(daemon: RegistryDaemon) -> None:
+    server: FakeGithubServer = daemon.fake_server  # type: ignore
+    server.state.branches["main"].files[MODIFIED_PATH] = "schemaVersion: 2.2.0\n"
+    post(daemon, recorded_push())
+    daemon.tick()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the broken stack is dropped",
+                args=None,
+                want=False,
+                func=lambda: MODIFIED_PATH in daemon.stacks,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="its error is recorded",
+                args=None,
+                want=["KeyError: 'metadata'"],
+                func=lambda: daemon.provider.stack_errors[MODIFIED_PATH],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="nothing is left to retry",
+                args=None,
+                want={},
+                func=lambda: daemon.changed,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_scan_skips_broken_stacks(daemon: RegistryDaemon) -> None:
+    server: FakeGithubServer = daemon.fake_server  # type: ignore
+    files = server.state.branches["main"].files
+    content = files[MODIFIED_PATH]
+    files[MODIFIED_PATH] = "schemaVersion: 2.2.0\nmetadata:\n  name: broken\n"
+    daemon.scan()
+    broken = (MODIFIED_PATH in daemon.stacks, dict(daemon.provider.stack_errors))
+    files[MODIFIED_PATH] = content
+    daemon.scan()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the broken stack is skipped by the scan",
+                args=None,
+                want=(False, {MODIFIED_PATH: ["KeyError: 'tags'"]}),
+                func=lambda: broken,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the fixed stack is loaded by the next scan",
+                args=None,
+                want=(True, {}),
+                func=lambda: (
+                    MODIFIED_PATH in daemon.stacks,
+                    daemon.provider.stack_errors,
+                ),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_tick_skips_handled_prs(daemon: RegistryDaemon) -> None:
+    server: FakeGithubServer = daemon.fake_server  # type: ignore
+    daemon.provider.pr_creation_limit = 1
+    first = daemon.tick()
+    server.reset_stats()
+    second = daemon.tick()
+    branch_requests = server.count("GET", "/branches/devfile_maintainer")
+    daemon.scan()
+    rescanned = daemon.tick()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="more stacks are due than the PR creation limit",
+                args=None,
+                want=True,
+                func=lambda: len(first) > 2,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the next tick leaves the created PR out",
+                args=None,
+                want=[pr.branch_name for pr in first[1:]],
+                func=lambda: [pr.branch_name for pr in second],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="only the branch of the next PR is checked",
+                args=None,
+                want=1,
+                func=lambda: branch_requests,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="a full scan checks the opened PRs again",
+                args=None,
+                want=[pr.branch_name for pr in first],
+                func=lambda: [pr.branch_name for pr in rescanned],
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_timer_survives_failed_ticks(daemon: RegistryDaemon) -> None:
+    ticks = []
+
+    def failing_tick() -> list:
+        ticks.append(1)
+        if len(ticks) >= 3:
+            daemon.stopped.set()
+        raise KeyError("tags")
+
+    daemon.interval = 0  # type: ignore
+    with patch.object(daemon, "tick", failing_tick):
+        daemon._run_timer()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the timer keeps ticking after a failure",
+                args=None,
+                want=3,
+                func=lambda: len(ticks),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_daemon_provider(fake_github: FakeGithubServer, tmp_path) -> None:
+    with patch("maintainer.GITHUB_API_URL", fake_github.base_url), patch(
+        "maintainer.REGISTRY_REPO", fake_github.state.repo
+    ), patch("maintainer.SCAN_BUDGET_SECONDS", 1), patch(
+        "maintainer.EXPIRY_INDEX_PATH", str(tmp_path / "expiry.jsonl")
+    ):
+        run_provider = get_provider()
+        daemon_provider = get_provider(daemon=True)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="a run is budgeted and indexed",
+                args=None,
+                want=(True, True),
+                func=lambda: (
+                    run_provider.scan_budget.limited,
+                    run_provider.expiry_index.enabled,
+                ),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the daemon scans every stack and skips the broken ones",
+                args=None,
+                want=(False, False, True),
+                func=lambda: (
+                    daemon_provider.scan_budget.limited,
+                    daemon_provider.expiry_index.enabled,
+                    daemon_provider.skip_broken_stacks,
+                ),
+                want_error=None,
+            ),
+        ]
+    )
@@ -0,0 +1,228 @@
+import argparse
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+from maintainer import (
+    CompactRegistryStack,
+    GithubProvider,
+    RegistryRepoPR,
+    RegistryStack,
+    get_maintainer,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import SyntheticRegistry, generate_registry
+
+STACK_FIELDS = (
+    "name",
+    "devfile_path",
+    "devfile_content",
+    "file_sha",
+    "last_modified",
+    "deprecated",
+    "owners",
+)
+
+
+@dataclass
+class Source:
+    """
+    a way of reading the stacks and planning their PRs. The first source
+    given to the harness is the baseline the others are compared to.
+    """
+
+    name: str
+    provider_kwargs: dict[str, Any] = field(default_factory=dict)
+    compact: bool = False
+    # plans with RegistryStackMaintainer.update per stack instead of update_all
+    per_stack: bool = False
+
+
+SOURCES = [
+    Source("api", per_stack=True),
+    Source("api+update_all"),
+    Source("api+compact", compact=True),
+    Source("archive", {"stacks_source": "archive"}),
+    Source("git", {"stacks_source": "git"}),
+    Source("git+pool", {"stacks_source": "git", "parse_workers": 2}),
+]
+
+
+@dataclass
+class SourceResult:
+    """
+    the stacks (by devfile path) and the planned PRs (by file path) a source
+    gave, along with the time and requests it took.
+    """
+
+    source: str
+    stacks: dict[str, dict[str, Any]]
+    prs: dict[str, dict[str, Any]]
+    seconds: float = 0.0
+    requests: int = 0
+
+
+@dataclass
+class Difference:
+    source: str
+    kind: str
+    key: str
+    field: str
+    want: Any
+    got: Any
+
+    def __str__(self) -> str:
+        return "{} {} {} {}: want {} got {}".format(
+            self.source,
+            self.kind,
+            self.key,
+            self.field,
+            _short(self.want),
+            _short(self.got),
+        )
+
+
+def _short(value: Any, width: int = 60) -> str:
+    text = repr(value)
+    return text if len(text) <= width else text[: width - 3] + "..."
+
+
+def _pr_fields(pr: RegistryRepoPR) -> dict[str, Any]:
+    """
+    gets the fields of a PR, with the content compact stacks build on demand.
+    """
+    pr.get_devfile_updated_content()
+    return {k: v for k, v in asdict(pr).items() if k != "content_builder"}
+
+
+def run_source(server: FakeGithubServer, source: Source, mirror: str) -> SourceResult:
+    """
+    reads the stacks of the served registry and plans their PRs through the
+    given source. Only the reading and planning are timed.
+    """
+    provider = GithubProvider(
+        token="harness-token",
+        registry_url=server.state.repo,
+        base_url=server.base_url,
+        **dict({"local_mirror": mirror}, **source.provider_kwargs),
+    )
+    _maintainer = get_maintainer(provider)
+    server.reset_stats()
+
+    started = time.perf_counter()
+    stacks: list[RegistryStack] | list[CompactRegistryStack]
+    if source.compact:
+        stacks = provider.get_compact_stacks()
+    else:
+        stacks = provider.get_stacks()
+    if source.per_stack:
+        prs = [pr for pr in map(_maintainer.update, stacks) if pr is not None]
+    else:
+        prs = _maintainer.update_all(stacks)
+    seconds = time.perf_counter() - started
+    requests = len(server.requests)
+
+    return SourceResult(
+        source=source.name,
+        # compact stacks fetch their content here, after the timing
+        stacks={
+            s.devfile_path: {f: getattr(s, f) for f in STACK_FIELDS} for s in stacks
+        },
+        prs={pr.filepath: _pr_fields(pr) for pr in prs},
+        seconds=seconds,
+        requests=requests,
+    )
+
+
+def _compare_items(
+    source: str,
+    kind: str,
+    want: dict[str, dict[str, Any]],
+    got: dict[str, dict[str, Any]],
+) -> list[Difference]:
+    differences: list[Difference] = []
+    for key in sorted(set(want) | set(got)):
+        if key not in want or key not in got:
+            differences.append(
+                Difference(source, kind, key, "exists", key in want, key in got)
+            )
+            continue
+        for name, value in want[key].items():
+            if got[key].get(name) != value:
+                differences.append(
+                    Difference(source, kind, key, name, value, got[key].get(name))
+                )
+    return differences
+
+
+def compare(baseline: SourceResult, result: SourceResult) -> list[Difference]:
+    """
+    compares the stacks and PRs of a source with the baseline ones, field by
+    field. PRs are matched by file path, as update_all sorts them by
+    staleness instead of the stacks order.
+    """
+    return _compare_items(
+        result.source, "stack", baseline.stacks, result.stacks
+    ) + _compare_items(result.source, "pr", baseline.prs, result.prs)
+
+
+def run_harness(
+    registry: SyntheticRegistry, mirror: str, sources: list[Source] = SOURCES
+) -> tuple[list[SourceResult], list[Difference]]:
+    """
+    runs all sources against the same registry, served by a fake github and
+    written to a git repo at the mirror path, and compares them with the
+    first one.
+    """
+    registry.to_git_repo(mirror)
+    # several full scans go beyond the default rate limit
+    with FakeGithubServer(registry, rate_limit=10**6) as server:
+        results = [run_source(server, source, mirror) for source in sources]
+    baseline = results[0]
+    return results, [d for r in results[1:] for d in compare(baseline, r)]
+
+
+def format_report(results: list[SourceResult], differences: list[Difference]) -> str:
+    baseline = results[0]
+    lines = [
+        "{:<16}{:>8}{:>6}{:>10}{:>10}{:>8}".format(
+            "source", "stacks", "prs", "requests", "seconds", "speed"
+        )
+    ]
+    for r in results:
+        lines.append(
+            "{:<16}{:>8}{:>6}{:>10}{:>10.3f}{:>7.2f}x".format(
+                r.source,
+                len(r.stacks),
+                len(r.prs),
+                r.requests,
+                r.seconds,
+                baseline.seconds / max(r.seconds, 1e-9),
+            )
+        )
+    lines.append("{} differences from {}".format(len(differences), baseline.source))
+    lines.extend("  {}".format(d) for d in differences)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m tests.equivalence",
+        description="checks that all stack sources and planners give the same "
+        "stacks and PRs on a synthetic registry, and compares their timings.",
+    )
+    parser.add_argument("--size", type=int, default=200, help="stack versions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    registry = generate_registry(args.size, seed=args.seed)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results, differences = run_harness(registry, "{}/registry.git".format(tmp_dir))
+    print(format_report(results, differences))
+    return 1 if len(differences) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+from tests.equivalence import (
+    Difference,
+    Source,
+    SourceResult,
+    compare,
+    format_report,
+    run_harness,
+)
+from tests.generator import generate_registry
+from tests.utils import MaintainerTestCase, run_test_cases
+
+
+def test_sources_are_equivalent(tmp_path) -> None:
+    registry = generate_registry(40, seed=5)
+    results, differences = run_harness(registry, str(tmp_path / "registry.git"))
+    baseline = results[0]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="all sources give the baseline stacks and PRs",
+                args=None,
+                want=[],
+                func=lambda: [str(d) for d in differences],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the comparison covers every stack",
+                args=None,
+                want=len(registry.devfile_paths),
+                func=lambda: len(baseline.stacks),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the comparison covers PRs",
+                args=None,
+                want=True,
+                func=lambda: len(baseline.prs) > 0,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the git source makes no request",
+                args=None,
+                want=0,
+                func=lambda: next(r for r in results if r.source == "git").requests,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_sources_differences(tmp_path) -> None:
+    registry = generate_registry(20, seed=5)
+    # a source planning with another limit must not pass as equivalent
+    _, differences = run_harness(
+        registry,
+        str(tmp_path / "registry.git"),
+        [Source("api"), Source("api-30-days", {"deprecation_days_limit": 30})],
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="extra PRs are found",
+                args=None,
+                want=True,
+                func=lambda: len(differences) > 0,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="stacks are still the same",
+                args=None,
+                want={"pr"},
+                func=lambda: {d.kind for d in differences},
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_compare() -> None:
+    stack = {"name": "go", "file_sha": "a", "deprecated": False}
+    pr = {"action": "deprecate", "branch_name": "deprecate-go"}
+    baseline = SourceResult(
+        source="api",
+        stacks={"stacks/go/devfile.yaml": stack},
+        prs={"stacks/go/devfile.yaml": pr},
+        seconds=2.0,
+    )
+    result = SourceResult(
+        source="fast",
+        stacks={"stacks/go/devfile.yaml": dict(stack, file_sha="b")},
+        prs={},
+        seconds=0.5,
+    )
+    differences = compare(baseline, result)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="changed field and missing PR",
+                args=None,
+                want=[
+                    Difference(
+                        "fast", "stack", "stacks/go/devfile.yaml", "file_sha", "a", "b"
+                    ),
+                    Difference(
+                        "fast", "pr", "stacks/go/devfile.yaml", "exists", True, False
+                    ),
+                ],
+                func=lambda: differences,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="same result",
+                args=(baseline, baseline),
+                want=[],
+                func=compare,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="report has the relative speed and the differences",
+                args=None,
+                want=True,
+                func=lambda: "4.00x" in format_report([baseline, result], differences)
+                and "2 differences from api"
+                in format_report([baseline, result], differences),
+                want_error=None,
+            ),
+        ]
+    )
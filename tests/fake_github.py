@@ -0,0 +1,513 @@
+import base64
+import hashlib
+import io
+import json
+import re
+import tarfile
+import threading
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+from maintainer import DATETIME_STRFTIME_FORMAT
+from tests.generator import SyntheticRegistry, git_blob_sha
+
+REPO = r"^/repos/(?P<repo>[^/]+/[^/]+)"
+ROUTES: list[tuple[str, re.Pattern, str]] = [
+    ("GET", re.compile(r"^/user$"), "user"),
+    ("GET", re.compile(REPO + r"$"), "repo"),
+    ("GET", re.compile(REPO + r"/contents/?(?P<path>.*)$"), "contents"),
+    ("PUT", re.compile(REPO + r"/contents/(?P<path>.+)$"), "contents"),
+    ("DELETE", re.compile(REPO + r"/contents/(?P<path>.+)$"), "contents"),
+    ("GET", re.compile(REPO + r"/commits$"), "commits"),
+    ("GET", re.compile(REPO + r"/branches/(?P<branch>.+)$"), "branch"),
+    ("GET", re.compile(REPO + r"/git/ref/heads/(?P<branch>.+)$"), "ref"),
+    ("POST", re.compile(REPO + r"/git/refs$"), "refs"),
+    ("GET", re.compile(REPO + r"/git/trees/(?P<sha>[^/]+)$"), "tree"),
+    ("GET", re.compile(REPO + r"/pulls$"), "pulls"),
+    ("GET", re.compile(REPO + r"/tarball/(?P<ref>.+)$"), "tarball"),
+    (
+        "GET",
+        re.compile(r"^/_codeload/(?P<repo>[^/]+/[^/]+)/tar.gz/(?P<ref>.+)$"),
+        "archive",
+    ),
+    ("POST", re.compile(REPO + r"/pulls$"), "pulls"),
+]
+
+
+class FakeGithubError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class FakeBranch:
+    sha: str
+    files: dict[str, str]
+
+
+@dataclass
+class FakeGithubState:
+    """
+    the mutable repo state served by the FakeGithubServer.
+    """
+
+    registry: SyntheticRegistry
+    repo: str
+    default_branch: str = "main"
+    branches: dict[str, FakeBranch] = field(default_factory=dict)
+    pulls: list[dict[str, Any]] = field(default_factory=list)
+    _commit_counter: int = 0
+
+    def __post_init__(self) -> None:
+        self.branches[self.default_branch] = FakeBranch(
+            sha=self.new_commit_sha(), files=dict(self.registry.files)
+        )
+
+    def new_commit_sha(self) -> str:
+        self._commit_counter += 1
+        return hashlib.sha1(str(self._commit_counter).encode()).hexdigest()
+
+    def tree_sha(self, branch: str) -> str:
+        files = self.branches[branch].files
+        digest = hashlib.sha1()
+        for path in sorted(files):
+            digest.update("{} {}\n".format(path, git_blob_sha(files[path])).encode())
+        return digest.hexdigest()
+
+
+class FakeGithubServer:
+    """
+    an in-process fake of the github REST API, serving a SyntheticRegistry,
+    along with the ones added through add_repo. It covers the endpoints used
+    by the GithubProvider (contents, commits, git refs, trees and pulls) and
+    can simulate latency, pagination and rate limits.
+    """
+
+    def __init__(
+        self,
+        registry: SyntheticRegistry,
+        repo: str = "fake/registry",
+        default_branch: str = "main",
+        latency: float = 0.0,
+        max_per_page: int = 100,
+        rate_limit: int = 5000,
+        tokens: set[str] | None = None,
+        oauth_scopes: str | None = None,
+    ) -> None:
+        self.state = FakeGithubState(
+            registry=registry, repo=repo, default_branch=default_branch
+        )
+        self.states = {repo: self.state}
+        self.latency = latency
+        self.max_per_page = max_per_page
+        self.rate_limit = rate_limit
+        self.rate_remaining = rate_limit
+        # when set only these tokens are accepted
+        self.tokens = tokens
+        # sent as X-OAuth-Scopes header, like for classic personal access tokens
+        self.oauth_scopes = oauth_scopes
+        self.requests: list[tuple[str, str]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return "http://127.0.0.1:{}".format(self._httpd.server_address[1])
+
+    @property
+    def repo_url(self) -> str:
+        return "{}/repos/{}".format(self.base_url, self.state.repo)
+
+    def add_repo(
+        self, registry: SyntheticRegistry, repo: str, default_branch: str = "main"
+    ) -> FakeGithubState:
+        state = FakeGithubState(
+            registry=registry, repo=repo, default_branch=default_branch
+        )
+        self.states[repo] = state
+        return state
+
+    def start(self) -> "FakeGithubServer":
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, args=(0.05,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "FakeGithubServer":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.requests = []
+            self.connections = 0
+            self.rate_remaining = self.rate_limit
+
+    def count(self, verb: str | None = None, contains: str = "") -> int:
+        return len(
+            [
+                r
+                for r in self.requests
+                if (verb is None or r[0] == verb) and contains in r[1]
+            ]
+        )
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self) -> None:
+                with server._lock:
+                    server.connections += 1
+                super().setup()
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_GET(self) -> None:
+                server._dispatch(self, "GET")
+
+            def do_POST(self) -> None:
+                server._dispatch(self, "POST")
+
+            def do_PUT(self) -> None:
+                server._dispatch(self, "PUT")
+
+            def do_DELETE(self) -> None:
+                server._dispatch(self, "DELETE")
+
+        return Handler
+
+    def _send(
+        self,
+        handler: BaseHTTPRequestHandler,
+        status: int,
+        body: Any,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        raw = json.dumps(body).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(raw)))
+        handler.send_header("X-RateLimit-Limit", str(self.rate_limit))
+        handler.send_header("X-RateLimit-Remaining", str(self.rate_remaining))
+        handler.send_header(
+            "X-RateLimit-Used", str(self.rate_limit - self.rate_remaining)
+        )
+        handler.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        if self.oauth_scopes is not None:
+            handler.send_header("X-OAuth-Scopes", self.oauth_scopes)
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(raw)
+
+    def _send_raw(
+        self, handler: BaseHTTPRequestHandler, raw: bytes, content_type: str
+    ) -> None:
+        handler.send_response(200)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(raw)))
+        handler.end_headers()
+        handler.wfile.write(raw)
+
+    def _dispatch(self, handler: BaseHTTPRequestHandler, verb: str) -> None:
+        parsed = urllib.parse.urlparse(handler.path)
+        path = urllib.parse.unquote(parsed.path)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = json.loads(handler.rfile.read(length) or b"{}") if length else {}
+
+        with self._lock:
+            self.requests.append((verb, handler.path))
+            rate_limited = self.rate_remaining <= 0
+            if not rate_limited:
+                self.rate_remaining -= 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+        if rate_limited:
+            return self._send(handler, 403, {"message": "API rate limit exceeded"})
+
+        token = (handler.headers.get("Authorization") or "").replace("token ", "")
+        if self.tokens is not None and token not in self.tokens:
+            return self._send(handler, 401, {"message": "Bad credentials"})
+
+        for route_verb, pattern, name in ROUTES:
+            match = pattern.match(path)
+            if route_verb != verb or match is None:
+                continue
+            groups = match.groupdict()
+            state = self.states.get(groups.pop("repo", self.state.repo))
+            if state is None:
+                return self._send(handler, 404, {"message": "Not Found"})
+            func: Callable = getattr(self, "_{}_{}".format(verb.lower(), name))
+            try:
+                with self._lock:
+                    # the handlers serve self.state, so it points to the repo
+                    # requested while the lock is held
+                    default_state, self.state = self.state, state
+                    try:
+                        result = func(
+                            query=query, body=body, url_path=parsed.path, **groups
+                        )
+                    finally:
+                        self.state = default_state
+            except FakeGithubError as err:
+                return self._send(handler, err.status, {"message": err.message})
+            if isinstance(result, bytes):
+                return self._send_raw(handler, result, "application/x-gzip")
+            return self._send(handler, *result)
+
+        self._send(handler, 404, {"message": "Not Found"})
+
+    def _branch(self, name: str | None) -> FakeBranch:
+        branch = self.state.branches.get(name or self.state.default_branch)
+        if branch is None:
+            raise FakeGithubError(404, "Branch not found")
+        return branch
+
+    def _content_json(self, path: str, ref: str, files: dict[str, str]) -> dict:
+        is_file = path in files
+        data: dict[str, Any] = {
+            "type": "file" if is_file else "dir",
+            "name": path.split("/")[-1],
+            "path": path,
+            "sha": git_blob_sha(files[path]) if is_file else git_blob_sha(path),
+            "url": "{}/contents/{}?ref={}".format(
+                self.repo_url, urllib.parse.quote(path), urllib.parse.quote(ref)
+            ),
+        }
+        if is_file:
+            data["size"] = len(files[path].encode())
+        return data
+
+    def _commit_json(self, sha: str, date: datetime, message: str = "") -> dict:
+        date_str = date.strftime("%Y-%m-%dT%H:%M:%SZ")
+        identity = {"name": "fake", "email": "fake@example.com", "date": date_str}
+        return {
+            "sha": sha,
+            "url": "{}/commits/{}".format(self.repo_url, sha),
+            "commit": {"message": message, "author": identity, "committer": identity},
+        }
+
+    def _paginate(
+        self, items: list, query: dict[str, str], url_path: str
+    ) -> tuple[list, dict[str, str]]:
+        per_page = min(int(query.get("per_page", 30)), self.max_per_page)
+        page = int(query.get("page", 1))
+        headers: dict[str, str] = {}
+        if page * per_page < len(items):
+            next_query = dict(query, page=str(page + 1), per_page=str(per_page))
+            headers["Link"] = '<{}{}?{}>; rel="next"'.format(
+                self.base_url, url_path, urllib.parse.urlencode(next_query)
+            )
+        return items[(page - 1) * per_page : page * per_page], headers
+
+    def _get_user(self, **kwargs: Any) -> tuple[int, dict]:
+        return 200, {"login": "fake-user", "id": 1}
+
+    def _get_repo(self, **kwargs: Any) -> tuple[int, dict]:
+        owner, name = self.state.repo.split("/")
+        return 200, {
+            "full_name": self.state.repo,
+            "name": name,
+            "owner": {"login": owner},
+            "url": self.repo_url,
+            "default_branch": self.state.default_branch,
+        }
+
+    def _get_contents(
+        self, query: dict[str, str], path: str, **kwargs: Any
+    ) -> tuple[int, Any]:
+        path = path.strip("/")
+        ref = query.get("ref", self.state.default_branch)
+        files = self._branch(ref).files
+        if path in files:
+            data = self._content_json(path, ref, files)
+            data["encoding"] = "base64"
+            data["content"] = base64.b64encode(files[path].encode()).decode()
+            return 200, data
+
+        prefix = path + "/" if path else ""
+        children: dict[str, None] = {}
+        for file_path in files:
+            if file_path.startswith(prefix):
+                children[prefix + file_path[len(prefix) :].split("/")[0]] = None
+        if len(children) == 0:
+            raise FakeGithubError(404, "Not Found")
+        return 200, [self._content_json(child, ref, files) for child in children]
+
+    def _put_contents(
+        self, body: dict[str, Any], path: str, **kwargs: Any
+    ) -> tuple[int, dict]:
+        branch = self._branch(body.get("branch"))
+        if path in branch.files and git_blob_sha(branch.files[path]) != body.get("sha"):
+            raise FakeGithubError(409, "{} does not match".format(body.get("sha")))
+        branch.files[path] = base64.b64decode(body["content"]).decode()
+        branch.sha = self.state.new_commit_sha()
+        content = self._content_json(path, body.get("branch", ""), branch.files)
+        return 200, {
+            "content": content,
+            "commit": self._commit_json(branch.sha, datetime.utcnow(), body["message"]),
+        }
+
+    def _delete_contents(
+        self, body: dict[str, Any], path: str, **kwargs: Any
+    ) -> tuple[int, dict]:
+        branch = self._branch(body.get("branch"))
+        if path not in branch.files:
+            raise FakeGithubError(404, "Not Found")
+        if git_blob_sha(branch.files[path]) != body.get("sha"):
+            raise FakeGithubError(409, "{} does not match".format(body.get("sha")))
+        del branch.files[path]
+        branch.sha = self.state.new_commit_sha()
+        return 200, {
+            "content": None,
+            "commit": self._commit_json(branch.sha, datetime.utcnow(), body["message"]),
+        }
+
+    def _get_commits(
+        self, query: dict[str, str], url_path: str, **kwargs: Any
+    ) -> tuple[int, list, dict[str, str]]:
+        file_path = query.get("path", "")
+        dates = self.state.registry.commits.get(file_path, [])
+        commits = [
+            self._commit_json(
+                hashlib.sha1("{}:{}".format(file_path, i).encode()).hexdigest(), date
+            )
+            for i, date in enumerate(dates)
+        ]
+        page, headers = self._paginate(commits, query, url_path)
+        if len(dates) > 0:
+            headers["Last-Modified"] = dates[0].strftime(DATETIME_STRFTIME_FORMAT)
+        return 200, page, headers
+
+    def _get_branch(self, branch: str, **kwargs: Any) -> tuple[int, dict]:
+        _branch = self._branch(branch)
+        return 200, {
+            "name": branch,
+            "protected": False,
+            "commit": {
+                "sha": _branch.sha,
+                "url": "{}/commits/{}".format(self.repo_url, _branch.sha),
+                "commit": {"tree": {"sha": self.state.tree_sha(branch)}},
+            },
+        }
+
+    def _get_ref(self, branch: str, **kwargs: Any) -> tuple[int, dict]:
+        _branch = self._branch(branch)
+        return 200, {
+            "ref": "refs/heads/{}".format(branch),
+            "url": "{}/git/refs/heads/{}".format(self.repo_url, branch),
+            "object": {"sha": _branch.sha, "type": "commit"},
+        }
+
+    def _post_refs(self, body: dict[str, Any], **kwargs: Any) -> tuple[int, dict]:
+        name = body["ref"].replace("refs/heads/", "", 1)
+        if name in self.state.branches:
+            raise FakeGithubError(422, "Reference already exists")
+        source = next(
+            (b for b in self.state.branches.values() if b.sha == body["sha"]), None
+        )
+        if source is None:
+            raise FakeGithubError(422, "Object does not exist")
+        self.state.branches[name] = FakeBranch(
+            sha=body["sha"], files=dict(source.files)
+        )
+        return 201, self._get_ref(name)[1]
+
+    def _get_tree(self, sha: str, **kwargs: Any) -> tuple[int, dict]:
+        branch = next(
+            (
+                b
+                for name, b in self.state.branches.items()
+                if sha in (b.sha, name, self.state.tree_sha(name))
+            ),
+            None,
+        )
+        if branch is None:
+            raise FakeGithubError(404, "Not Found")
+        return 200, {
+            "sha": sha,
+            "url": "{}/git/trees/{}".format(self.repo_url, sha),
+            "truncated": False,
+            "tree": [
+                {
+                    "path": path,
+                    "mode": "100644",
+                    "type": "blob",
+                    "sha": git_blob_sha(content),
+                    "size": len(content.encode()),
+                }
+                for path, content in sorted(branch.files.items())
+            ],
+        }
+
+    def _get_pulls(
+        self, query: dict[str, str], url_path: str, **kwargs: Any
+    ) -> tuple[int, list, dict[str, str]]:
+        head = query.get("head", "").split(":")[-1]
+        pulls = [p for p in self.state.pulls if head in ("", p["head"]["ref"])]
+        page, headers = self._paginate(pulls, query, url_path)
+        return 200, page, headers
+
+    def _post_pulls(self, body: dict[str, Any], **kwargs: Any) -> tuple[int, dict]:
+        if body["head"] not in self.state.branches:
+            raise FakeGithubError(422, "Validation Failed")
+        if any(p["head"]["ref"] == body["head"] for p in self.state.pulls):
+            raise FakeGithubError(422, "A pull request already exists")
+        number = len(self.state.pulls) + 1
+        pull = {
+            "number": number,
+            "state": "open",
+            "title": body["title"],
+            "body": body.get("body"),
+            "url": "{}/pulls/{}".format(self.repo_url, number),
+            "head": {"ref": body["head"], "sha": self.state.branches[body["head"]].sha},
+            "base": {"ref": body["base"]},
+        }
+        self.state.pulls.append(pull)
+        return 201, pull
+
+    def _get_tarball(self, ref: str, **kwargs: Any) -> tuple[int, None, dict]:
+        self._branch(ref)
+        location = "{}/_codeload/{}/tar.gz/{}".format(
+            self.base_url, self.state.repo, urllib.parse.quote(ref)
+        )
+        return 302, None, {"Location": location}
+
+    def _get_archive(self, ref: str, **kwargs: Any) -> bytes:
+        """
+        builds the tar.gz archive of the branch, having a single root dir like
+        the github ones.
+        """
+        branch = self._branch(ref)
+        root = "{}-{}".format(self.state.repo.replace("/", "-"), branch.sha[:7])
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as archive:
+            for path in sorted(branch.files):
+                raw = branch.files[path].encode()
+                info = tarfile.TarInfo("{}/{}".format(root, path))
+                info.size = len(raw)
+                archive.addfile(info, io.BytesIO(raw))
+        return buf.getvalue()
@@ -0,0 +1,288 @@
+from unittest.mock import patch
+
+import pytest
+
+import maintainer
+from maintainer import (
+    PR_CREATION_LIMIT,
+    CriticalException,
+    GithubProvider,
+    RegistryStackMaintainer,
+    StepJournal,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+from tests.utils import MaintainerTestCase, run_test_cases
+
+
+def test_main_end_to_end() -> None:
+    registry = generate_registry(30, seed=1)
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        _maintainer = RegistryStackMaintainer()
+        planned = _maintainer.update_all(provider.get_stacks())
+        server.reset_stats()
+
+        with patch("maintainer.GITHUB_TOKEN", "test-token"), patch(
+            "maintainer.GITHUB_API_URL", server.base_url
+        ), patch("maintainer.REGISTRY_REPO", server.state.repo):
+            maintainer.main(["run"])
+
+        created = planned[:PR_CREATION_LIMIT]
+        assert [p["head"]["ref"] for p in server.state.pulls] == [
+            pr.branch_name for pr in created
+        ]
+        for pr in created:
+            branch_files = server.state.branches[pr.branch_name].files
+            if pr.action == "deprecate":
+                assert branch_files[pr.filepath] == pr.devfile_updated_content
+            else:
+                assert pr.filepath not in branch_files
+        # the default branch is never touched
+        assert server.state.branches["main"].files == registry.files
+        assert server.count("GET", "/commits?") == len(registry.devfile_paths)
+
+
+def test_commits_pagination() -> None:
+    registry = generate_registry(5, seed=2)
+    path = max(registry.devfile_paths, key=lambda p: len(registry.commits[p]))
+    with FakeGithubServer(registry, max_per_page=1) as server:
+        provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        commits = list(provider.registry_repo.get_commits(path=path))
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="all commit pages are fetched",
+                    args=None,
+                    want=len(registry.commits[path]),
+                    func=lambda: len(commits),
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="one request per page",
+                    args=("GET", "/commits?"),
+                    want=len(registry.commits[path]),
+                    func=server.count,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_rate_limit_headers() -> None:
+    with FakeGithubServer(generate_registry(5), rate_limit=3) as server:
+        provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        _ = provider.registry_repo.get_contents("stacks")
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="rate limit headers are parsed",
+                    args=None,
+                    want=(1, 3),
+                    func=lambda: provider.gb.rate_limiting,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+@patch("maintainer.TEST_MODE", 0)
+def test_bad_credentials() -> None:
+    with FakeGithubServer(generate_registry(5), tokens={"good-token"}) as server:
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="bad credentials given",
+                    args=("bad-token", server.state.repo, server.base_url),
+                    func=GithubProvider,
+                    want_error=CriticalException,  # type: ignore
+                ),
+                MaintainerTestCase(
+                    title="good credentials given",
+                    args=("good-token", server.state.repo, server.base_url),
+                    func=GithubProvider,
+                    want_type=GithubProvider,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_main_plan(capsys: pytest.CaptureFixture) -> None:
+    registry = generate_registry(10, seed=4)
+    with FakeGithubServer(registry) as server:
+        with patch("maintainer.GITHUB_API_URL", server.base_url), patch(
+            "maintainer.REGISTRY_REPO", server.state.repo
+        ):
+            maintainer.main(["plan"])
+
+        planned = [
+            line.split("\t")
+            for line in capsys.readouterr().out.splitlines()
+            if line.strip()
+        ]
+        assert len(planned) > 0
+        assert all(action in ("deprecate", "remove") for action, _, _ in planned)
+        # plan never writes to the registry repo
+        assert server.state.pulls == []
+        assert server.count("POST") + server.count("PUT") + server.count("DELETE") == 0
+
+
+def _crash_on(step: str):
+    """
+    makes the journal raise right before recording the given step, as if the
+    run was killed just after the step was done in the repo.
+    """
+    record = StepJournal.record
+
+    def crashing_record(self: StepJournal, branch: str, _step: str) -> None:
+        if _step == step:
+            raise KeyboardInterrupt()
+        record(self, branch, _step)
+
+    return patch.object(StepJournal, "record", crashing_record)
+
+
+@pytest.mark.parametrize("crash_step", ["branch", "commit", "pr"])
+def test_create_prs_resumes_from_journal(tmp_path, crash_step: str) -> None:
+    journal_path = str(tmp_path / "journal.jsonl")
+    registry = generate_registry(30, seed=1)
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            journal_path=journal_path,
+        )
+        prs = RegistryStackMaintainer().update_all(provider.get_stacks())[:2]
+        with _crash_on(crash_step), pytest.raises(KeyboardInterrupt):
+            provider.create_prs(prs)
+
+        GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            journal_path=journal_path,
+        ).create_prs(prs)
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="all prs are created once",
+                    args=None,
+                    want=[pr.branch_name for pr in prs],
+                    func=lambda: [p["head"]["ref"] for p in server.state.pulls],
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="branches are created once",
+                    args=("POST", "/git/refs"),
+                    want=len(prs),
+                    func=server.count,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="files are committed once",
+                    args=None,
+                    want=len(prs),
+                    func=lambda: server.count("PUT", "/contents/")
+                    + server.count("DELETE", "/contents/"),
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="pr creation is not retried",
+                    args=("POST", "/pulls"),
+                    want=len(prs),
+                    func=server.count,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="finished prs are dropped from the journal",
+                    args=None,
+                    want={},
+                    func=lambda: StepJournal(journal_path).steps,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_create_prs_skips_unknown_branch() -> None:
+    registry = generate_registry(30, seed=1)
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        prs = RegistryStackMaintainer().update_all(provider.get_stacks())[:1]
+        provider._create_branch(prs[0])
+        provider.create_prs(prs)
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="branch not found in the journal is skipped",
+                    args=None,
+                    want=[],
+                    func=lambda: server.state.pulls,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_compact_content_is_fetched_for_created_prs() -> None:
+    registry = generate_registry(100, seed=4)
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            pr_creation_limit=5,
+        )
+        stacks = provider.get_compact_stacks()
+        server.reset_stats()
+        prs = RegistryStackMaintainer().update_all(stacks)
+        planned_fetches = server.count("GET", "/contents/")
+        provider.create_prs(prs)
+        deprecated = [pr.filepath for pr in prs[:5] if pr.action == "deprecate"]
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="enough PRs are planned",
+                    args=None,
+                    want=True,
+                    func=lambda: len(prs) > 5 and len(deprecated) > 0,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="planning fetches no devfile",
+                    args=None,
+                    want=0,
+                    func=lambda: planned_fetches,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="only devfiles of created PRs are fetched",
+                    args=None,
+                    want=len(deprecated),
+                    func=lambda: server.count("GET", "/contents/"),
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="the deprecated devfiles are committed",
+                    args=None,
+                    want=True,
+                    func=lambda: all(
+                        "Deprecated"
+                        in server.state.branches[pr.branch_name].files[pr.filepath]
+                        for pr in prs[:5]
+                        if pr.action == "deprecate"
+                    ),
+                    want_error=None,
+                ),
+            ]
+        )
@@ -0,0 +1,268 @@
+import base64
+import calendar
+import random
+import subprocess
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from github.Commit import Commit
+from github.ContentFile import ContentFile
+
+from maintainer import DATETIME_STRFTIME_FORMAT, DEPRECATED_TAG, STACKS_DIR
+from maintainer import git_blob_sha as _git_blob_sha
+from tests.mocker import MOCKED_HEADERS, MOCKED_REQUESTER
+
+DEVFILE_TEMPLATE = """schemaVersion: 2.2.0
+metadata:
+  name: {name}
+  version: {version}
+  displayName: {display_name}
+  description: Stack with {language} for the {name} runtime.
+  tags:
+{tags}
+  projectType: {language}
+  language: {language}
+  provider: Synthetic
+starterProjects:
+  - name: {name}-starter
+    git:
+      remotes:
+        origin: https://github.com/devfile-samples/{name}-starter.git
+components:
+  - name: runtime
+    container:
+      image: registry.access.redhat.com/ubi9/{image}:latest
+      memoryLimit: 1024Mi
+      mountSources: true
+      endpoints:
+        - name: http-{name}
+          targetPort: 8080
+commands:
+  - id: build
+    exec:
+      component: runtime
+      commandLine: make build
+      workingDir: ${{PROJECT_SOURCE}}
+      group:
+        kind: build
+        isDefault: true
+  - id: run
+    exec:
+      component: runtime
+      commandLine: make run
+      workingDir: ${{PROJECT_SOURCE}}
+      group:
+        kind: run
+        isDefault: true
+"""
+OWNERS_TEMPLATE = "reviewers:\n{reviewers}\napprovers:\n{reviewers}\n"
+# an OWNERS file having an empty reviewers key, which loads as None
+EMPTY_REVIEWERS_OWNERS = "reviewers:\napprovers:\n  - registry-admin\n"
+LANGUAGES = ["Go", "Java", "Node.js", "Python", "PHP", "dotNET", "Rust"]
+
+
+def git_blob_sha(content: str) -> str:
+    """
+    computes the sha git (and so github) would assign to the given file content.
+    """
+    return _git_blob_sha(content.encode())
+
+
+@dataclass
+class SyntheticRegistry:
+    """
+    an in-memory devfile registry repo with devfiles, OWNERS files and
+    commit histories.
+    """
+
+    stacks_dir: str = STACKS_DIR
+    files: dict[str, str] = field(default_factory=dict)
+    # commit dates per file path, newest first
+    commits: dict[str, list[datetime]] = field(default_factory=dict)
+
+    @property
+    def devfile_paths(self) -> list[str]:
+        return [p for p in self.files if p.endswith(("/devfile.yaml", "/devfile.yml"))]
+
+    @property
+    def owners_paths(self) -> list[str]:
+        return [p for p in self.files if p.endswith("/OWNERS")]
+
+    def last_modified(self, path: str) -> datetime | None:
+        dates = self.commits.get(path, [])
+        return dates[0] if len(dates) > 0 else None
+
+    def to_content_file(self, path: str) -> ContentFile:
+        if path not in self.files:
+            return ContentFile(
+                requester=MOCKED_REQUESTER,
+                headers=MOCKED_HEADERS,
+                attributes={"path": path, "type": "dir"},
+                completed=True,
+            )
+        return ContentFile(
+            requester=MOCKED_REQUESTER,
+            headers=MOCKED_HEADERS,
+            attributes={
+                "path": path,
+                "type": "file",
+                "sha": git_blob_sha(self.files[path]),
+                "encoding": "base64",
+                "content": base64.b64encode(self.files[path].encode()).decode(),
+            },
+            completed=True,
+        )
+
+    def list_dir(self, path: str) -> list[str]:
+        """
+        returns the direct children (files and dirs) of the given path.
+        """
+        prefix = path.rstrip("/") + "/"
+        children: dict[str, None] = {}
+        for file_path in self.files:
+            if file_path.startswith(prefix):
+                children[prefix + file_path[len(prefix) :].split("/")[0]] = None
+        return list(children)
+
+    def get_contents(self, path: str, ref: str | None = None) -> list[ContentFile]:
+        """
+        mocks github.Repository.Repository.get_contents for directories.
+        """
+        return [self.to_content_file(p) for p in self.list_dir(path)]
+
+    def get_commits(self, path: str) -> list[Commit]:
+        """
+        mocks github.Repository.Repository.get_commits for a single path.
+        """
+        return [
+            Commit(
+                requester=MOCKED_REQUESTER,
+                headers={
+                    "last-modified": datetime.strftime(d, DATETIME_STRFTIME_FORMAT)
+                },
+                attributes={"sha": "{:040x}".format(i)},
+                completed=True,
+            )
+            for i, d in enumerate(self.commits.get(path, []))
+        ]
+
+    def to_git_repo(self, repo_path: str, branch: str = "main") -> str:
+        """
+        writes the registry to a bare git repo, with a commit for each date in
+        the commit histories. Older commits carry a revision comment, so every
+        commit actually changes its files.
+        """
+        events: dict[datetime, list[str]] = {}
+        for path in self.files:
+            dates = self.commits.get(path) or [datetime(2000, 1, 1)]
+            for date in dates:
+                events.setdefault(date, []).append(path)
+        remaining = {p: max(len(self.commits.get(p, [])), 1) for p in self.files}
+
+        stream: list[bytes] = []
+        for mark, date in enumerate(sorted(events), start=1):
+            timestamp = calendar.timegm(date.timetuple())
+            message = "commit {}".format(mark).encode()
+            stream.append(
+                b"commit refs/heads/%s\nmark :%d\n"
+                b"committer Registry Bot <bot@example.com> %d +0000\n"
+                b"data %d\n%s\n"
+                % (branch.encode(), mark, timestamp, len(message), message)
+            )
+            for path in events[date]:
+                remaining[path] -= 1
+                content = self.files[path]
+                if remaining[path] > 0:
+                    content += "# revision {}\n".format(remaining[path])
+                data = content.encode()
+                stream.append(
+                    b"M 100644 inline %s\ndata %d\n%s\n"
+                    % (path.encode(), len(data), data)
+                )
+
+        subprocess.run(
+            ["git", "init", "-q", "--bare", "-b", branch, repo_path], check=True
+        )
+        subprocess.run(
+            ["git", "-C", repo_path, "fast-import", "--quiet"],
+            input=b"".join(stream),
+            check=True,
+        )
+        return repo_path
+
+
+def generate_registry(
+    size: int,
+    stacks_dir: str = STACKS_DIR,
+    versions_per_stack: int = 3,
+    owners_ratio: float = 0.8,
+    deprecated_ratio: float = 0.1,
+    max_age_days: int = 900,
+    max_commits: int = 4,
+    seed: int = 0,
+    now: datetime | None = None,
+    empty_reviewers_every: int = 10,
+) -> SyntheticRegistry:
+    """
+    builds a synthetic registry having `size` stack versions. Stacks with a
+    single version keep their devfile at the stack root, all others use a
+    dir per version. The OWNERS file of every `empty_reviewers_every` stack
+    has no reviewers.
+    """
+    rnd = random.Random(seed)
+    now = (now or datetime.now()).replace(microsecond=0)
+    registry = SyntheticRegistry(stacks_dir=stacks_dir)
+    registry.files["{}/OWNERS".format(stacks_dir)] = OWNERS_TEMPLATE.format(
+        reviewers="  - registry-admin"
+    )
+
+    stack_idx = 0
+    generated = 0
+    while generated < size:
+        name = "stack-{}".format(stack_idx)
+        language = LANGUAGES[stack_idx % len(LANGUAGES)]
+        versions = min(rnd.randint(1, versions_per_stack), size - generated)
+        generated += versions
+        for v in range(versions):
+            version = "1.{}.0".format(v)
+            version_dir = (
+                "{}/{}".format(stacks_dir, name)
+                if versions == 1
+                else "{}/{}/{}".format(stacks_dir, name, version)
+            )
+            tags = ["    - {}".format(language), "    - Synthetic"]
+            if rnd.random() < deprecated_ratio:
+                tags.append("    - {}".format(DEPRECATED_TAG))
+            path = "{}/devfile.{}".format(
+                version_dir, "yml" if rnd.random() < 0.05 else "yaml"
+            )
+            registry.files[path] = DEVFILE_TEMPLATE.format(
+                name=name,
+                version=version,
+                display_name=name.replace("-", " ").title(),
+                language=language,
+                image=language.lower().replace(".", ""),
+                tags="\n".join(tags),
+            )
+            newest = now - timedelta(
+                days=rnd.randint(0, max_age_days), seconds=rnd.randint(0, 86399)
+            )
+            registry.commits[path] = [
+                newest - timedelta(days=7 * c)
+                for c in range(rnd.randint(1, max_commits))
+            ]
+
+        if rnd.random() < owners_ratio:
+            owners_path = "{}/{}/OWNERS".format(stacks_dir, name)
+            registry.files[owners_path] = OWNERS_TEMPLATE.format(
+                reviewers="\n".join(
+                    "  - maintainer-{}".format(rnd.randint(0, size // 10 + 1))
+                    for _ in range(rnd.randint(1, 3))
+                )
+            )
+            if empty_reviewers_every > 0 and stack_idx % empty_reviewers_every == 5:
+                registry.files[owners_path] = EMPTY_REVIEWERS_OWNERS
+            registry.commits[owners_path] = [now - timedelta(days=max_age_days)]
+        stack_idx += 1
+
+    return registry
@@ -1,9 +1,30 @@
+import json
+import logging
+import os
+import subprocess
 from datetime import datetime
 from unittest.mock import patch
 
+import pytest
 from github import Github
+from github.Repository import Repository
 
-from maintainer import DATETIME_STRFTIME_FORMAT, GithubProvider
+from maintainer import (
+    DEVFILE_SCHEMA_PATH,
+    GITHUB_PER_PAGE,
+    CriticalException,
+    ExpiryIndex,
+    GithubProvider,
+    GitMirror,
+    RegistryStack,
+    RegistryStackMaintainer,
+    ScanBudget,
+    ScanCursor,
+    build_github_client,
+    to_epoch,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
 from tests.mocker import GithubMocker
 from tests.utils import MaintainerTestCase, run_test_cases
 
@@ -54,7 +75,7 @@ def test__get_last_modified_with_commits(github_provider: GithubProvider) -> Non
 )
 @patch(
     "github.Commit.Commit.last_modified",
-    datetime.strftime(datetime.now(), DATETIME_STRFTIME_FORMAT),
+    mocker.mocked_commit.last_modified_recent_str,
 )
 def test__get_last_modified_without_commits(github_provider: GithubProvider) -> None:
     run_test_cases(
@@ -76,7 +97,7 @@ def test__get_last_modified_without_commits(github_provider: GithubProvider) ->
 )
 @patch(
     "github.Commit.Commit.last_modified",
-    datetime.strftime(datetime.now(), DATETIME_STRFTIME_FORMAT),
+    mocker.mocked_commit.last_modified_recent_str,
 )
 def test__get_repo_items(github_provider: GithubProvider) -> None:
     run_test_cases(
@@ -90,3 +111,566 @@ def test__get_repo_items(github_provider: GithubProvider) -> None:
             ),
         ]
     )
+
+
+def test_build_github_client() -> None:
+    gb = build_github_client("test-token", pool_size=2, throttle=False)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="client uses the max page size",
+                args=None,
+                want=GITHUB_PER_PAGE,
+                func=lambda: gb.per_page,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="client without token",
+                args=(None,),
+                want_type=Github,
+                func=build_github_client,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test__get_registry_repo(caplog: pytest.LogCaptureFixture) -> None:
+    with FakeGithubServer(generate_registry(1), oauth_scopes="read:org") as server:
+        provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        with caplog.at_level(logging.WARNING):
+            run_test_cases(
+                [
+                    MaintainerTestCase(
+                        title="get registry repo",
+                        args=(server.state.repo,),
+                        want_type=Repository,
+                        func=provider._get_registry_repo,
+                        want_error=None,
+                    ),
+                ]
+            )
+        assert "the token has no repo scope" in caplog.text
+        # credentials are validated by the repo request, no extra user call
+        assert server.count(contains="/user") == 0
+
+
+def _stack_fields(stacks: list[RegistryStack]) -> list[tuple]:
+    return sorted(
+        (
+            s.devfile_path,
+            s.name,
+            s.file_sha,
+            s.last_modified,
+            s.deprecated,
+            s.devfile_content,
+            s.owners,
+        )
+        for s in stacks
+    )
+
+
+def test_get_stacks_from_archive() -> None:
+    registry = generate_registry(30, seed=5)
+    with FakeGithubServer(registry) as server:
+        api_provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        archive_provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            stacks_source="archive",
+        )
+        api_stacks = api_provider.get_stacks()
+        server.reset_stats()
+        archive_stacks = archive_provider.get_stacks()
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="archive gives the same stacks as the api",
+                    args=(archive_stacks,),
+                    want=_stack_fields(api_stacks),
+                    func=_stack_fields,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="no contents request is made",
+                    args=(None, "/contents"),
+                    want=0,
+                    func=server.count,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="archive is downloaded once",
+                    args=(None, "/_codeload/"),
+                    want=1,
+                    func=server.count,
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_get_stacks_from_git_mirror(tmp_path) -> None:
+    registry = generate_registry(30, seed=6)
+    mirror = registry.to_git_repo(str(tmp_path / "registry.git"))
+    with FakeGithubServer(registry) as server:
+        api_provider = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        )
+        git_provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            stacks_source="git",
+            local_mirror=mirror,
+        )
+        api_stacks = api_provider.get_stacks()
+        server.reset_stats()
+        git_stacks = git_provider.get_stacks()
+        run_test_cases(
+            [
+                MaintainerTestCase(
+                    title="git mirror gives the same stacks as the api",
+                    args=(git_stacks,),
+                    want=_stack_fields(api_stacks),
+                    func=_stack_fields,
+                    want_error=None,
+                ),
+                MaintainerTestCase(
+                    title="no api request is made for files or commits",
+                    args=(None, None),
+                    want=0,
+                    func=lambda *_: server.count(None, "/contents")
+                    + server.count(None, "/commits"),
+                    want_error=None,
+                ),
+            ]
+        )
+
+
+def test_git_mirror_last_modified(tmp_path) -> None:
+    repo = str(tmp_path / "repo")
+    git = ["git", "-C", repo, "-c", "user.name=bot", "-c", "user.email=bot@x"]
+    subprocess.run(["git", "init", "-q", "-b", "main", repo], check=True)
+    # the first file is named like a commit time
+    for name, date in (("1234", 1000000000), ("stack.yaml", 1100000000)):
+        (tmp_path / "repo" / name).write_text(name)
+        subprocess.run([*git, "add", name], check=True)
+        subprocess.run(
+            [*git, "commit", "-q", "-m", name, "--date", "@{}".format(date)],
+            check=True,
+            env=dict(os.environ, GIT_COMMITTER_DATE="@{}".format(date)),
+        )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="paths are dated by their last commit only",
+                args=("main", "."),
+                want={"1234": 1000000000, "stack.yaml": 1100000000},
+                func=GitMirror(repo).last_modified,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_stacks_from_git_mirror_missing(
+    tmp_path, fake_github: FakeGithubServer
+) -> None:
+    provider = GithubProvider(
+        token="test-token",
+        registry_url=fake_github.state.repo,
+        base_url=fake_github.base_url,
+        stacks_source="git",
+        local_mirror=str(tmp_path / "missing.git"),
+    )
+    with pytest.raises(CriticalException):
+        provider._get_git_items("stacks")
+
+
+def test_get_stacks_with_parse_workers() -> None:
+    registry = generate_registry(30, seed=7)
+    with FakeGithubServer(registry) as server:
+        serial_stacks = GithubProvider(
+            token="test-token", registry_url=server.state.repo, base_url=server.base_url
+        ).get_stacks()
+
+    broken_path = registry.devfile_paths[0]
+    registry.files[broken_path] = "schemaVersion: 2.2.0\nmetadata:\n  name: broken\n"
+    with FakeGithubServer(registry) as server:
+        pooled_stacks = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            parse_workers=2,
+        ).get_stacks()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="pooled parsing gives the same stacks, skipping broken ones",
+                args=(pooled_stacks,),
+                want=_stack_fields(
+                    [s for s in serial_stacks if s.devfile_path != broken_path]
+                ),
+                func=_stack_fields,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_stacks_with_schema_validation() -> None:
+    registry = generate_registry(20, seed=7)
+    broken_path, invalid_path = registry.devfile_paths[:2]
+    registry.files[broken_path] = "schemaVersion: 2.2.0\n"
+    registry.files[invalid_path] = registry.files[invalid_path].replace(
+        "targetPort: 8080", "targetPort: http"
+    )
+    with FakeGithubServer(registry) as server:
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            devfile_schema_path=DEVFILE_SCHEMA_PATH,
+        )
+        stacks = provider.get_stacks()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="only the stack without metadata is skipped",
+                args=None,
+                want=sorted(p for p in registry.devfile_paths if p != broken_path),
+                func=lambda: sorted(s.devfile_path for s in stacks),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="errors are kept per stack",
+                args=None,
+                want={
+                    broken_path: ["KeyError: 'metadata'"],
+                    invalid_path: [
+                        "$.components[0].container.endpoints[0].targetPort: "
+                        "'http' is not of type 'integer'"
+                    ],
+                },
+                func=lambda: provider.stack_errors,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_stacks_with_scan_budget(tmp_path) -> None:
+    cursor_path = str(tmp_path / "cursor.json")
+    registry = generate_registry(30, seed=9)
+    devfile_paths = sorted(registry.devfile_paths)
+    runs = 4
+    share = -(-len(devfile_paths) // runs)
+    with FakeGithubServer(registry) as server:
+        scanned = []
+        for _ in range(runs + 1):
+            provider = GithubProvider(
+                token="test-token",
+                registry_url=server.state.repo,
+                base_url=server.base_url,
+                # a single call spends the budget, so only the coverage share
+                # of the stacks is scanned each run
+                scan_budget=ScanBudget(calls=1, coverage_runs=runs),
+                scan_cursor_path=cursor_path,
+            )
+            scanned.append([s.devfile_path for s in provider.get_stacks()])
+            provider.save_scan_cursor([])
+        cursor = ScanCursor.load(cursor_path)
+        tree_sha = server.state.tree_sha("main")
+
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="run {} scans the next stacks in path order".format(i),
+                args=None,
+                want=(devfile_paths + devfile_paths)[i * share : (i + 1) * share],
+                func=lambda i=i: scanned[i],
+                want_error=None,
+            )
+            for i in range(runs)
+        ]
+        + [
+            MaintainerTestCase(
+                title="registry is covered within the coverage runs",
+                args=None,
+                want=devfile_paths,
+                func=lambda: sorted({p for paths in scanned[:runs] for p in paths}),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="scan wraps around after the last stack",
+                args=None,
+                want=(devfile_paths + devfile_paths)[runs * share : (runs + 1) * share],
+                func=lambda: scanned[runs],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="cursor keeps the tree sha",
+                args=None,
+                want=tree_sha,
+                func=lambda: cursor.tree_sha,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_scan_cursor_keeps_pending_stacks(tmp_path) -> None:
+    cursor_path = str(tmp_path / "cursor.json")
+    registry = generate_registry(30, seed=9)
+    devfile_paths = sorted(registry.devfile_paths)
+    share = -(-len(devfile_paths) // 4)
+    with FakeGithubServer(registry) as server:
+
+        def get_provider() -> GithubProvider:
+            return GithubProvider(
+                token="test-token",
+                registry_url=server.state.repo,
+                base_url=server.base_url,
+                scan_budget=ScanBudget(calls=1, coverage_runs=4),
+                scan_cursor_path=cursor_path,
+                pr_creation_limit=1,
+            )
+
+        provider = get_provider()
+        prs = RegistryStackMaintainer().update_all(provider.get_stacks())
+        planned = os.path.exists(cursor_path)
+        provider.create_prs(prs)
+        provider.save_scan_cursor(prs)
+        pending = ScanCursor.load(cursor_path).pending
+        scanned = [s.devfile_path for s in get_provider().get_stacks()]
+
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="more stacks are due than the PR creation limit",
+                args=None,
+                want=True,
+                func=lambda: len(prs) > 1,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="planning doesn't save the cursor",
+                args=None,
+                want=False,
+                func=lambda: planned,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="due stacks without a PR are pending",
+                args=None,
+                want=sorted(pr.filepath for pr in prs[1:]),
+                func=lambda: pending,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="pending stacks are scanned first, then the next share",
+                args=None,
+                want=pending + devfile_paths[share : 2 * share],
+                func=lambda: scanned,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_stacks_with_scan_budget_and_parse_workers(tmp_path) -> None:
+    from concurrent.futures import ProcessPoolExecutor
+
+    registry = generate_registry(100, seed=4)
+    with FakeGithubServer(registry) as server, patch(
+        "maintainer.SCAN_PARSE_BATCH", 40
+    ), patch(
+        "concurrent.futures.ProcessPoolExecutor", wraps=ProcessPoolExecutor
+    ) as pool_class:
+        provider = GithubProvider(
+            token="test-token",
+            registry_url=server.state.repo,
+            base_url=server.base_url,
+            parse_workers=2,
+            scan_budget=ScanBudget(seconds=3600),
+            scan_cursor_path=str(tmp_path / "cursor.json"),
+        )
+        stacks = provider.get_stacks()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="all batches are parsed",
+                args=None,
+                want=sorted(registry.devfile_paths),
+                func=lambda: [s.devfile_path for s in stacks],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="a single pool is used by the whole scan",
+                args=None,
+                want=1,
+                func=lambda: pool_class.call_count,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_scan_budget() -> None:
+    with patch("maintainer.time.monotonic", return_value=100.0):
+        budget = ScanBudget(seconds=10, calls=50, coverage_runs=4)
+    with patch("maintainer.time.monotonic", return_value=105.0):
+        within_time = budget.spent(10, 20, calls=10)
+        over_calls = budget.spent(10, 20, calls=50)
+        below_share = budget.spent(4, 20, calls=50)
+    with patch("maintainer.time.monotonic", return_value=110.0):
+        over_time = budget.spent(10, 20, calls=10)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="budget within time and calls",
+                args=None,
+                want=False,
+                func=lambda: within_time,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="budget over calls",
+                args=None,
+                want=True,
+                func=lambda: over_calls,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="budget over time",
+                args=None,
+                want=True,
+                func=lambda: over_time,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="coverage share is scanned over budget",
+                args=None,
+                want=False,
+                func=lambda: below_share,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="unlimited budget is never spent",
+                args=(10**6, 1),
+                want=False,
+                func=ScanBudget().spent,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_stacks_with_expiry_index(tmp_path) -> None:
+    index_path = str(tmp_path / "index.jsonl")
+    registry = generate_registry(30, seed=10, max_age_days=700)
+    with FakeGithubServer(registry) as server:
+
+        def get_stacks(**kwargs) -> list[RegistryStack]:
+            return GithubProvider(
+                token="test-token",
+                registry_url=server.state.repo,
+                base_url=server.base_url,
+                expiry_index_path=index_path,
+                **kwargs,
+            ).get_stacks()
+
+        all_stacks = get_stacks()
+        index = ExpiryIndex(index_path)
+        server.reset_stats()
+        due_stacks = get_stacks()
+        due_commits = server.count("GET", "/commits?")
+
+        changed_path = next(
+            p for p, (_, due) in index.entries.items() if due > to_epoch(datetime.now())
+        )
+        server.state.branches["main"].files[changed_path] += "# changed\n"
+        changed_stacks = get_stacks()
+
+    maintainer = RegistryStackMaintainer()
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="first run indexes every stack sorted by due date",
+                args=None,
+                want=sorted(
+                    (index.entries[s.devfile_path][1], s.devfile_path)
+                    for s in all_stacks
+                ),
+                func=lambda: [
+                    (e["due"], e["path"])
+                    for e in map(json.loads, open(index_path).readlines()[1:])
+                ],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="next run only fetches the due stacks",
+                args=(due_stacks,),
+                want=sorted(
+                    s.devfile_path
+                    for s in all_stacks
+                    if index.entries[s.devfile_path][1] <= to_epoch(datetime.now())
+                ),
+                func=lambda stacks: sorted(s.devfile_path for s in stacks),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="commits are only fetched for the due stacks",
+                args=None,
+                want=len(due_stacks),
+                func=lambda: due_commits,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="due stacks give the same prs",
+                args=(due_stacks,),
+                want=maintainer.update_all(all_stacks),
+                func=maintainer.update_all,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="changed stacks are fetched again",
+                args=(changed_stacks,),
+                want=sorted([s.devfile_path for s in due_stacks] + [changed_path]),
+                func=lambda stacks: sorted(s.devfile_path for s in stacks),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_expiry_index_limits_changed(tmp_path) -> None:
+    index_path = str(tmp_path / "index.jsonl")
+    index = ExpiryIndex(index_path, deprecation_days_limit=365)
+    index.entries["stacks/go/devfile.yaml"] = ("sha", 10.0)
+    index.save({"stacks/go/devfile.yaml"})
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="index with the same limits is loaded",
+                args=None,
+                want={"stacks/go/devfile.yaml": ("sha", 10.0)},
+                func=lambda: ExpiryIndex(
+                    index_path, deprecation_days_limit=365
+                ).entries,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="index with other limits is rebuilt",
+                args=None,
+                want={},
+                func=lambda: ExpiryIndex(index_path, deprecation_days_limit=30).entries,
+                want_error=None,
+            ),
+        ]
+    )
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 from github.Commit import Commit
@@ -82,8 +82,10 @@ class MockedGithubContentFile:
 
 @dataclass
 class GithubMocker:
-    mocked_commit: MockedGithubCommit = MockedGithubCommit()
-    mocked_content_file: MockedGithubContentFile = MockedGithubContentFile()
+    mocked_commit: MockedGithubCommit = field(default_factory=MockedGithubCommit)
+    mocked_content_file: MockedGithubContentFile = field(
+        default_factory=MockedGithubContentFile
+    )
 
     def get_commits(self, path: str) -> "list[Commit]":
         return [self.mocked_commit.to_commit]
@@ -0,0 +1,336 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+import maintainer
+from maintainer import (
+    CriticalException,
+    GithubProvider,
+    RegistryReport,
+    RegistrySettings,
+    RegistryStackMaintainer,
+    get_registry_path,
+    load_registries,
+    maintain_registries,
+    report_registries,
+)
+from tests.fake_github import FakeGithubServer
+from tests.generator import generate_registry
+from tests.utils import MaintainerTestCase, run_test_cases
+
+REGISTRIES = """
+- fake/registry
+- repo: fake/product-registry
+  stacks_dir: registry-stacks
+  default_branch: release
+  deprecation_days_limit: 200
+  pr_creation_limit: 1
+"""
+
+
+@pytest.fixture()
+def fake_registries():
+    """
+    serves two registries with different settings from the same fake server.
+    """
+    with FakeGithubServer(generate_registry(30, seed=1)) as server:
+        server.add_repo(
+            generate_registry(20, stacks_dir="registry-stacks", seed=2),
+            "fake/product-registry",
+            default_branch="release",
+        )
+        with patch("maintainer.GITHUB_API_URL", server.base_url):
+            yield server
+
+
+def test_load_registries(tmp_path) -> None:
+    registries_file = tmp_path / "registries.yaml"
+    registries_file.write_text(REGISTRIES)
+    product_registry = RegistrySettings(
+        repo="fake/product-registry",
+        stacks_dir="registry-stacks",
+        default_branch="release",
+        deprecation_days_limit=200,
+        pr_creation_limit=1,
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="repo names and settings are given inline",
+                args=(REGISTRIES,),
+                want=[RegistrySettings(repo="fake/registry"), product_registry],
+                func=load_registries,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="registries are read from a file",
+                args=(str(registries_file),),
+                want=[RegistrySettings(repo="fake/registry"), product_registry],
+                func=load_registries,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="registries are given as json",
+                args=('[{"repo": "fake/registry", "removal_days_limit": 30}]',),
+                want=[RegistrySettings(repo="fake/registry", removal_days_limit=30)],
+                func=load_registries,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="registries are not a list",
+                args=("repo: fake/registry",),
+                want=None,
+                func=load_registries,
+                want_error=CriticalException,  # type: ignore
+            ),
+            MaintainerTestCase(
+                title="registry without repo",
+                args=("- stacks_dir: stacks",),
+                want=None,
+                func=load_registries,
+                want_error=CriticalException,  # type: ignore
+            ),
+            MaintainerTestCase(
+                title="unknown setting",
+                args=("- repo: fake/registry\n  stack_dir: stacks",),
+                want=None,
+                func=load_registries,
+                want_error=CriticalException,  # type: ignore
+            ),
+            MaintainerTestCase(
+                title="invalid limit",
+                args=("- repo: fake/registry\n  pr_creation_limit: many",),
+                want=None,
+                func=load_registries,
+                want_error=CriticalException,  # type: ignore
+            ),
+            MaintainerTestCase(
+                title="registry given twice",
+                args=("- fake/registry\n- repo: fake/registry",),
+                want=None,
+                func=load_registries,
+                want_error=CriticalException,  # type: ignore
+            ),
+        ]
+    )
+
+
+def test_get_registry_path() -> None:
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="repo is added before the extension",
+                args=("state/drm_journal.jsonl", "devfile/registry"),
+                want="state/drm_journal.devfile-registry.jsonl",
+                func=get_registry_path,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="empty path stays empty",
+                args=("", "devfile/registry"),
+                want="",
+                func=get_registry_path,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_maintain_registries(fake_registries: FakeGithubServer) -> None:
+    server = fake_registries
+    registries = load_registries(REGISTRIES)
+    # the PRs each registry needs, checked one by one
+    planned = {}
+    for settings in registries:
+        provider = GithubProvider(
+            registry_url=settings.repo,
+            base_url=server.base_url,
+            stacks_dir=settings.stacks_dir,
+            default_branch=settings.default_branch,
+        )
+        planned[settings.repo] = RegistryStackMaintainer(
+            deprecation_days_limit=settings.deprecation_days_limit
+        ).update_all(provider.get_stacks())
+    server.reset_stats()
+
+    with patch(
+        "maintainer.get_github_client", wraps=maintainer.get_github_client
+    ) as get_github_client:
+        reports = maintain_registries(
+            registries + [RegistrySettings(repo="fake/missing")], workers=3
+        )
+    product = server.states["fake/product-registry"]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="reports keep the given order",
+                args=None,
+                want=["fake/registry", "fake/product-registry", "fake/missing"],
+                func=lambda: [r.repo for r in reports],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="stacks are read from the stacks_dir of each registry",
+                args=None,
+                want=[30, 20, 0],
+                func=lambda: [r.stacks for r in reports],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="PRs follow the limits of each registry",
+                args=None,
+                want=[planned["fake/registry"], planned["fake/product-registry"], []],
+                func=lambda: [r.prs for r in reports],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="PR creation limit of each registry",
+                args=None,
+                want=[min(len(planned["fake/registry"]), 5), 1, 0],
+                func=lambda: [r.created for r in reports],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="PRs target the default branch of their registry",
+                args=None,
+                want=[(planned["fake/product-registry"][0].branch_name, "release")],
+                func=lambda: [
+                    (p["head"]["ref"], p["base"]["ref"]) for p in product.pulls
+                ],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="a missing registry fails alone",
+                args=None,
+                want=[False, False, True],
+                func=lambda: [r.error is not None for r in reports],
+                want_error=None,
+            ),
+        ]
+    )
+    # each registry thread got its own client
+    assert get_github_client.call_count == 3
+
+
+def test_maintain_registries_with_broken_stack(
+    fake_registries: FakeGithubServer,
+) -> None:
+    product = fake_registries.states["fake/product-registry"]
+    files = product.branches["release"].files
+    files[sorted(p for p in files if p.endswith("/devfile.yaml"))[0]] = (
+        "schemaVersion: 2.2.0\n"
+    )
+    reports = maintain_registries(load_registries(REGISTRIES), create=False)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the registry failing on a stack is reported",
+                args=None,
+                want=[None, "KeyError: 'metadata'"],
+                func=lambda: [r.error for r in reports],
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="the other registry is still maintained",
+                args=None,
+                want=30,
+                func=lambda: reports[0].stacks,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_report_registries(tmp_path) -> None:
+    report_path = str(tmp_path / "report.json")
+    reports = [
+        RegistryReport(
+            repo="fake/registry",
+            stacks=3,
+            seconds=0.5,
+            stack_errors={"stacks/go/devfile.yaml": ["KeyError: 'metadata'"]},
+        ),
+        RegistryReport(repo="fake/missing", error="Not Found"),
+    ]
+    with pytest.raises(CriticalException):
+        report_registries(reports, report_path)
+
+    with open(report_path) as f:
+        report = json.load(f)
+    assert report == {
+        "registries": [
+            {
+                "repo": "fake/registry",
+                "stacks": 3,
+                "prs": [],
+                "created": 0,
+                "error": None,
+                "seconds": 0.5,
+                "stack_errors": {"stacks/go/devfile.yaml": ["KeyError: 'metadata'"]},
+            },
+            {
+                "repo": "fake/missing",
+                "stacks": 0,
+                "prs": [],
+                "created": 0,
+                "error": "Not Found",
+                "seconds": 0.0,
+                "stack_errors": {},
+            },
+        ]
+    }
+
+
+def test_plan_registries(fake_registries: FakeGithubServer, capsys) -> None:
+    with patch("maintainer.REGISTRIES", REGISTRIES):
+        maintainer.main(["plan"])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert {line.split("\t")[0] for line in lines} == {
+        "fake/registry",
+        "fake/product-registry",
+    }
+    assert all(
+        line.split("\t")[2].startswith("registry-stacks/")
+        for line in lines
+        if line.startswith("fake/product-registry\t")
+    )
+    # nothing is created by a plan
+    assert all(len(state.pulls) == 0 for state in fake_registries.states.values())
+
+
+def test_run_report(tmp_path) -> None:
+    registry = generate_registry(20, seed=3)
+    broken_path = registry.devfile_paths[0]
+    registry.files[broken_path] = "schemaVersion: 2.2.0\n"
+    report_path = str(tmp_path / "report.json")
+    with FakeGithubServer(registry) as server, patch(
+        "maintainer.GITHUB_API_URL", server.base_url
+    ), patch("maintainer.REGISTRY_REPO", server.state.repo), patch(
+        "maintainer.REPORT_PATH", report_path
+    ), patch(
+        "maintainer.VALIDATE_SCHEMA", 1
+    ):
+        maintainer.main(["run"])
+
+    with open(report_path) as f:
+        (report,) = json.load(f)["registries"]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="the broken stack is reported instead of failing the run",
+                args=None,
+                want=(19, [broken_path]),
+                func=lambda: (report["stacks"], list(report["stack_errors"])),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="PRs are still created",
+                args=None,
+                want=len(server.state.pulls),
+                func=lambda: report["created"],
+                want_error=None,
+            ),
+        ]
+    )
@@ -1,6 +1,14 @@
 from datetime import datetime, timedelta
+from typing import Any
 
-from maintainer import RegistryStack, RegistryStackMaintainer
+from maintainer import (
+    PolicyPlan,
+    RegistryStack,
+    RegistryStackMaintainer,
+    evaluate_policy,
+    to_epoch,
+)
+from tests.generator import generate_registry
 from tests.utils import MaintainerTestCase, run_test_cases
 
 
@@ -82,3 +90,208 @@ def test_add_owners_mention(registry_stack_maintainer: RegistryStackMaintainer)
             ),
         ]
     )
+
+
+def test_update_all(
+    test_registry_stack: RegistryStack,
+    test_expired_non_deprecated_registry_stack: RegistryStack,
+    test_deprecated_registry_stack: RegistryStack,
+    registry_stack_maintainer: RegistryStackMaintainer,
+) -> None:
+    stacks = [
+        test_registry_stack,
+        test_deprecated_registry_stack,
+        test_expired_non_deprecated_registry_stack,
+    ]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="update all stacks sorted by staleness",
+                args=(stacks,),
+                want=[
+                    registry_stack_maintainer._deprecate(
+                        test_expired_non_deprecated_registry_stack
+                    ),
+                    registry_stack_maintainer._remove(test_deprecated_registry_stack),
+                ],
+                func=registry_stack_maintainer.update_all,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="update all without stacks",
+                args=([],),
+                want=[],
+                func=registry_stack_maintainer.update_all,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_evaluate_policy() -> None:
+    now = datetime(2024, 6, 1)
+    epochs = [
+        to_epoch(now - timedelta(days=10)),
+        to_epoch(now - timedelta(days=400)),
+        to_epoch(now - timedelta(days=500)),
+        to_epoch(now - timedelta(days=10)),
+        to_epoch(now - timedelta(days=800)),
+    ]
+    deprecated = [False, False, True, True, False]
+    want = PolicyPlan(
+        deprecate_mask=[False, True, False, False, True],
+        remove_mask=[False, False, True, False, False],
+        candidates=[(4, "deprecate"), (2, "remove"), (1, "deprecate")],
+    )
+    args = (epochs, deprecated, to_epoch(now), 365, 365)
+    cases = [
+        MaintainerTestCase(
+            title="evaluate policy",
+            args=args,
+            want=want,
+            func=evaluate_policy,
+            want_error=None,
+        ),
+        MaintainerTestCase(
+            title="evaluate policy for empty registry",
+            args=([], [], to_epoch(now), 365, 365),
+            want=PolicyPlan(deprecate_mask=[], remove_mask=[], candidates=[]),
+            func=evaluate_policy,
+            want_error=None,
+        ),
+    ]
+    run_test_cases(cases)
+
+
+def test_patch_tag(registry_stack_maintainer: RegistryStackMaintainer) -> None:
+    patch_cases = [
+        (
+            "block list",
+            "metadata:\n  name: go\n  tags:\n    - Go\n    - Testing\n  language: Go\n",
+            "metadata:\n  name: go\n  tags:\n    - Go\n    - Testing\n"
+            "    - Deprecated\n  language: Go\n",
+        ),
+        (
+            "block list without indentation nor trailing newline",
+            "metadata:\n tags:\n - tag",
+            "metadata:\n tags:\n - tag\n - Deprecated",
+        ),
+        (
+            "block list with comments and quotes",
+            "# header\nmetadata:\n  tags:\n    - 'Go'  # language\n"
+            "    # more tags soon\n  language: Go\n",
+            "# header\nmetadata:\n  tags:\n    - 'Go'  # language\n"
+            "    - 'Deprecated'\n    # more tags soon\n  language: Go\n",
+        ),
+        (
+            "block list with crlf",
+            "metadata:\r\n  tags:\r\n  - Go\r\n",
+            "metadata:\r\n  tags:\r\n  - Go\r\n  - Deprecated\r\n",
+        ),
+        (
+            "flow list",
+            'metadata:\n  tags: [Go, "Testing"]  # tags\nschemaVersion: 2.2.0\n',
+            'metadata:\n  tags: [Go, "Testing", "Deprecated"]  # tags\n'
+            "schemaVersion: 2.2.0\n",
+        ),
+        (
+            "empty flow list",
+            "metadata:\n  tags: []\n",
+            "metadata:\n  tags: [Deprecated]\n",
+        ),
+        (
+            "block list after a byte order mark",
+            "\ufeffmetadata:\n  tags:\n    - Go\n",
+            "\ufeffmetadata:\n  tags:\n    - Go\n    - Deprecated\n",
+        ),
+        (
+            "flow list after a byte order mark",
+            "\ufeffmetadata:\n  tags: [Go]\n",
+            "\ufeffmetadata:\n  tags: [Go, Deprecated]\n",
+        ),
+    ]
+    fallback_cases = [
+        ("multi line flow list", "metadata:\n  tags: [Go,\n    Testing]\n"),
+        ("flow list with trailing comma", "metadata:\n  tags: [Go, Testing,]\n"),
+        ("aliased list", "base: &tags [Go]\nmetadata:\n  tags: *tags\n"),
+        ("multi line tag", 'metadata:\n  tags:\n    - "Go\n      Lang"\n'),
+        ("no tags", "metadata:\n  name: go\n"),
+        (
+            "duplicate metadata",
+            "metadata:\n  tags: [Go]\nmetadata:\n  tags: [Go]\n",
+        ),
+    ]
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="patch {}".format(title),
+                args=(content, "Deprecated"),
+                want=want,
+                func=registry_stack_maintainer._patch_tag,
+                want_error=None,
+            )
+            for title, content, want in patch_cases
+        ]
+        + [
+            MaintainerTestCase(
+                title="fall back on {}".format(title),
+                args=(content, "Deprecated"),
+                want=None,
+                func=registry_stack_maintainer._patch_tag,
+                want_error=None,
+            )
+            for title, content in fallback_cases
+        ]
+    )
+
+
+def test_patch_tag_matches_dump(
+    registry_stack_maintainer: RegistryStackMaintainer,
+) -> None:
+    registry = generate_registry(30, seed=8)
+    yaml = registry_stack_maintainer.yaml
+
+    def load_patched(content: str) -> Any:
+        return yaml.load(registry_stack_maintainer._patch_tag(content, "Deprecated"))
+
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="patched {} loads as the dumped one".format(path),
+                args=(registry.files[path],),
+                want=yaml.load(
+                    registry_stack_maintainer._dump_tag(
+                        registry.files[path], "Deprecated"
+                    )
+                ),
+                func=load_patched,
+                want_error=None,
+            )
+            for path in registry.devfile_paths
+        ]
+    )
+
+
+def test_deprecate_falls_back_to_dump(
+    registry_stack_maintainer: RegistryStackMaintainer,
+) -> None:
+    stack = RegistryStack(
+        path="stacks/test-stack/devfile.yaml",
+        raw_content="metadata:\n  tags: [tag,\n    other]\n",
+        last_modified="Sun, 03 Mar 2022 22:01:01 GMT",
+        file_sha="somesha",
+        owners_content=None,
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="deprecate a stack with an unpatchable layout",
+                args=(stack,),
+                want="metadata:\n  tags: [tag, other, Deprecated]\n",
+                func=lambda s: registry_stack_maintainer._deprecate(
+                    s
+                ).devfile_updated_content,
+                want_error=None,
+            ),
+        ]
+    )
@@ -1,7 +1,19 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from unittest.mock import patch
 
-from maintainer import RegistryStack
+import pytest
+
+from maintainer import (
+    DEVFILE_SCHEMA_PATH,
+    CriticalException,
+    RegistryStack,
+    StackFacts,
+    get_devfile_validator,
+    parse_all_stack_facts,
+    parse_stack_facts,
+)
+from tests.generator import generate_registry
 from tests.utils import MaintainerTestCase, run_test_cases
 
 
@@ -90,3 +102,263 @@ def test_get_owners(
             ),
         ]
     )
+
+
+def _facts_fields(facts: list[StackFacts]) -> list[tuple]:
+    return [(f.path, f.deprecated, f.owners, f.error is not None) for f in facts]
+
+
+def test_parse_stack_facts(owners_content: str) -> None:
+    path = "stacks/test-stack/devfile.yaml"
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="parse stack with owners",
+                args=(
+                    parse_stack_facts(
+                        [(path, b"metadata:\n tags:\n - tag", owners_content.encode())]
+                    ),
+                ),
+                want=[(path, False, ["maintainer"], False)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="parse deprecated stack without owners",
+                args=(
+                    parse_stack_facts(
+                        [(path, b"metadata:\n tags:\n - Deprecated", None)]
+                    ),
+                ),
+                want=[(path, True, [], False)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="parse stack without tags",
+                args=(parse_stack_facts([(path, b"metadata:\n name: test", None)]),),
+                want=[(path, False, [], True)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="parse invalid yaml",
+                args=(parse_stack_facts([(path, b"metadata: [\n", None)]),),
+                want=[(path, False, [], True)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="parse owners with empty reviewers",
+                args=(
+                    parse_stack_facts(
+                        [(path, b"metadata:\n tags:\n - tag", b"reviewers:\n")]
+                    ),
+                ),
+                want=[(path, False, [], False)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="invalid owners keep the devfile facts",
+                args=(
+                    parse_stack_facts(
+                        [(path, b"metadata:\n tags:\n - Deprecated", b"- [\n")]
+                    ),
+                ),
+                want=[(path, True, [], False)],
+                func=_facts_fields,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="invalid owners error is kept",
+                args=None,
+                want=True,
+                func=lambda: parse_stack_facts(
+                    [(path, b"metadata:\n tags:\n - tag", b"- reviewer\n")]
+                )[0].owners_error
+                is not None,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_parse_all_stack_facts() -> None:
+    items = [
+        (
+            "stacks/stack-{}/devfile.yaml".format(i),
+            "metadata:\n tags:\n - {}".format(
+                "Deprecated" if i % 3 else "tag"
+            ).encode(),
+            None,
+        )
+        for i in range(40)
+    ]
+    serial = parse_stack_facts(items)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="pooled parsing keeps the order of the stacks",
+                args=(parse_all_stack_facts(items, workers=2, chunk_size=8),),
+                want=_facts_fields(serial),
+                func=_facts_fields,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_parse_stack_facts_in_threads() -> None:
+    registry = generate_registry(40, seed=12)
+    items = [
+        (path, registry.files[path].encode(), None) for path in registry.devfile_paths
+    ]
+    serial = parse_stack_facts(items)
+    # the registries of a multi-registry run parse their stacks in threads
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        threaded = list(pool.map(lambda _: parse_stack_facts(items), range(4)))
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="threads parsing at once get the serial facts",
+                args=None,
+                want=[serial] * 4,
+                func=lambda: threaded,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_parse_stack_facts_with_schema() -> None:
+    path = "stacks/test-stack/devfile.yaml"
+    valid = b"schemaVersion: 2.2.0\nmetadata:\n  name: test\n  tags: [Go]\n"
+    invalid = (
+        b"schemaVersion: 2.2.0\nmetadata:\n  tags: [Go, 1]\n"
+        b"components:\n  - name: Runtime\n    container: {image: go}\n"
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="valid devfile",
+                args=([(path, valid, None)], DEVFILE_SCHEMA_PATH),
+                want=[StackFacts(path=path, deprecated=False, owners=[])],
+                func=parse_stack_facts,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="invalid devfile is still parsed",
+                args=([(path, invalid, None)], DEVFILE_SCHEMA_PATH),
+                want=[
+                    StackFacts(
+                        path=path,
+                        deprecated=False,
+                        owners=[],
+                        schema_errors=[
+                            "$.components[0].name: 'Runtime' does not match "
+                            "'^[a-z0-9]([-a-z0-9]*[a-z0-9])?$'",
+                            "$.metadata.tags[1]: 1 is not of type 'string'",
+                        ],
+                    )
+                ],
+                func=parse_stack_facts,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="devfile without metadata",
+                args=([(path, b"components: []\n", None)], DEVFILE_SCHEMA_PATH),
+                want=[
+                    StackFacts(
+                        path=path,
+                        deprecated=False,
+                        owners=[],
+                        error="KeyError: 'metadata'",
+                        schema_errors=["$: 'schemaVersion' is a required property"],
+                    )
+                ],
+                func=parse_stack_facts,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="pooled validation",
+                args=([(path, invalid, None)] * 40,),
+                want=parse_stack_facts(
+                    [(path, invalid, None)] * 40, DEVFILE_SCHEMA_PATH
+                ),
+                func=lambda items: parse_all_stack_facts(
+                    items, workers=2, chunk_size=8, schema_path=DEVFILE_SCHEMA_PATH
+                ),
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_get_devfile_validator(tmp_path) -> None:
+    broken_schema = tmp_path / "schema.json"
+    broken_schema.write_text('{"type": "objects"}')
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="validator is compiled once",
+                args=None,
+                want=True,
+                func=lambda: get_devfile_validator(DEVFILE_SCHEMA_PATH)
+                is get_devfile_validator(DEVFILE_SCHEMA_PATH),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="invalid schema",
+                args=(str(broken_schema),),
+                want=None,
+                func=get_devfile_validator,
+                want_error=CriticalException,  # type: ignore
+            ),
+            MaintainerTestCase(
+                title="missing schema",
+                args=(str(tmp_path / "missing.json"),),
+                want=None,
+                func=get_devfile_validator,
+                want_error=CriticalException,  # type: ignore
+            ),
+        ]
+    )
+    with patch.dict("sys.modules", {"jsonschema": None}), pytest.raises(
+        CriticalException
+    ):
+        get_devfile_validator(str(tmp_path / "other.json"))
+
+
+def test_from_facts(test_registry_stack: RegistryStack) -> None:
+    facts = StackFacts(
+        path=test_registry_stack.devfile_path,
+        deprecated=test_registry_stack.deprecated,
+        owners=list(test_registry_stack.owners),
+    )
+    stack = RegistryStack.from_facts(
+        facts,
+        raw_content=test_registry_stack.devfile_content,
+        last_modified=datetime.strftime(
+            test_registry_stack.last_modified, "%a, %d %b %Y %H:%M:%S GMT"
+        ),
+        file_sha=test_registry_stack.file_sha,
+    )
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="stack built from facts has the same attributes",
+                args=(stack,),
+                want=sorted(vars(test_registry_stack)),
+                func=lambda s: sorted(vars(s)),
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="stack built from facts matches the parsed one",
+                args=(stack,),
+                want=vars(test_registry_stack) | {"yaml": None},
+                func=lambda s: vars(s) | {"yaml": None},
+                want_error=None,
+            ),
+        ]
+    )
@@ -0,0 +1,95 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+from tests.utils import MaintainerTestCase, run_test_cases
+
+# cumulative import time budget of the maintainer module, in microseconds.
+# Timings are too noisy on shared runners, so it is only checked when set,
+# e.g. 50000 (about 1.5x the measured cost) by `make startup`.
+STARTUP_BUDGET_US = int(os.getenv("STARTUP_BUDGET_US", 0))
+HEAVY_MODULES = ("github", "ruamel", "numpy", "requests", "urllib3")
+
+
+def importtime(*args: str, runs: int = 1) -> dict[str, int]:
+    """
+    runs python with `-X importtime` and returns the cumulative import time
+    (in microseconds) of every module imported, the fastest of the given runs.
+    The bytecode is written to a temporary cache by a first run, so compiling
+    isn't measured.
+    """
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, PYTHONPYCACHEPREFIX=cache_dir)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        subprocess.run(
+            [sys.executable, *args], capture_output=True, env=env, cwd=cwd, check=True
+        )
+        modules: dict[str, int] = {}
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", *args],
+                capture_output=True,
+                text=True,
+                env=env,
+                cwd=cwd,
+            )
+            assert result.returncode == 0, result.stderr
+            for line in result.stderr.splitlines():
+                if not line.startswith("import time:") or "cumulative" in line:
+                    continue
+                _, cumulative, name = line.split("|")
+                name = name.strip()
+                modules[name] = min(int(cumulative), modules.get(name, int(cumulative)))
+    return modules
+
+
+def heavy_modules(modules: dict[str, int]) -> list[str]:
+    return [m for m in modules if m.split(".")[0] in HEAVY_MODULES]
+
+
+def test_import_is_slim() -> None:
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="no heavy dependency is imported",
+                args=(importtime("-c", "import maintainer"),),
+                want=[],
+                func=heavy_modules,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+@pytest.mark.skipif(STARTUP_BUDGET_US == 0, reason="STARTUP_BUDGET_US is not set")
+def test_import_budget() -> None:
+    modules = importtime("-c", "import maintainer", runs=5)
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="import stays within the startup budget",
+                args=None,
+                want=True,
+                func=lambda: modules["maintainer"] < STARTUP_BUDGET_US,
+                want_error=None,
+            ),
+        ]
+    )
+
+
+def test_help_is_slim() -> None:
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="--help doesn't import heavy dependencies",
+                args=(importtime("maintainer.py", "--help"),),
+                want=[],
+                func=heavy_modules,
+                want_error=None,
+            ),
+        ]
+    )
@@ -1,7 +1,10 @@
 import logging
+import os
+import subprocess
+import sys
 from unittest.mock import patch
 
-from maintainer import get_int_env_var, get_logging_level
+from maintainer import check_inputs, get_int_env_var, get_int_input, get_logging_level
 from tests.utils import MaintainerTestCase, run_test_cases
 
 
@@ -25,6 +28,57 @@ def test_get_int_env_var() -> None:
     )
 
 
+@patch("maintainer._int_inputs", {})
+@patch.dict(os.environ, {"TEST_ENV_VAR": "one"})
+def test_get_int_input() -> None:
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="invalid int input falls back to its default",
+                args=("TEST_ENV_VAR", 1),
+                want=1,
+                func=get_int_input,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="invalid int input is reported by the check",
+                args=None,
+                func=check_inputs,
+                want_error=SystemExit,  # type: ignore
+            ),
+        ]
+    )
+
+
+def test_invalid_input_on_commands() -> None:
+    def returncode(*args: str) -> int:
+        return subprocess.run(
+            [sys.executable, "maintainer.py", *args],
+            env=dict(os.environ, INPUT_PARSE_WORKERS="abc"),
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            capture_output=True,
+        ).returncode
+
+    run_test_cases(
+        [
+            MaintainerTestCase(
+                title="help is printed despite an invalid input",
+                args=("--help",),
+                want=0,
+                func=returncode,
+                want_error=None,
+            ),
+            MaintainerTestCase(
+                title="commands fail on an invalid input",
+                args=("plan",),
+                want=1,
+                func=returncode,
+                want_error=None,
+            ),
+        ]
+    )
+
+
 @patch("maintainer.DEBUG_MODE", 0)
 def test_get_logging_level_info() -> None:
     run_test_cases(